@@ -0,0 +1,138 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import json
+import random
+import re
+import threading
+import time
+
+from lxml import html
+
+from fake_site import PAGE_RE, render_post, render_search, serve
+
+PAYLOAD_RE = re.compile(r"const payload = (\{.*\});\n")
+
+
+def _search(payload: dict) -> dict:
+    # The browser gets past challenges, so only misses differ from a normal page.
+    parsed = urlparse(payload["search_url"])
+    page_match = PAGE_RE.match(parsed.path)
+    body = render_search(int(page_match.group(1)) if page_match else 1, last_page=3,
+                         query=parse_qs(parsed.query).get("s", [""])[0])
+    if body is None:
+        return {"results": [], "current_url": payload["search_url"]}
+
+    document = html.fromstring(body)
+    results = [
+        {"title": link.text_content().strip(), "url": urljoin(payload["base_url"], link.get("href"))}
+        for link in document.xpath("//div[@class='post']//div[@class='postTitle']//h2/a")
+    ]
+    return {"results": results, "current_url": payload["search_url"]}
+
+
+def _post_document(payload: dict):
+    return html.fromstring(render_post(urlparse(payload["url"]).path.strip("/").split("/")[-1]))
+
+
+def _post_info(payload: dict) -> dict:
+    document = _post_document(payload)
+    return {
+        "title": document.xpath("string(//h1[@itemprop='name'])").strip(),
+        "author": document.xpath("string(//span[contains(@class, 'author')])").strip(),
+        "current_url": payload["url"],
+    }
+
+
+def _download(payload: dict, torrent_files: bool = False) -> dict:
+    document = _post_document(payload)
+    if torrent_files:
+        links = document.xpath("//a[contains(text(), 'Torrent Free Downloads')]/@href")
+        return {"magnet_link": None, "torrent_url": urljoin(payload["url"], links[0]), "current_url": payload["url"]}
+
+    magnets = document.xpath("//a[@id='magnetIcon']/@href")
+    return {"magnet_link": magnets[0] if magnets else None, "torrent_url": None, "current_url": payload["url"]}
+
+
+def _login(payload: dict) -> dict:
+    return {"current_url": f"{payload['base_url']}/member/users/"}
+
+
+STEPS = {"login": _login, "search": _search, "post_info": _post_info, "download": _download}
+
+
+def run_script(script: str, torrent_files: bool = False) -> dict:
+    payload = json.loads(PAYLOAD_RE.search(script).group(1))
+    steps = payload.get("steps") if payload["action"] == "pipeline" else [payload["action"]]
+
+    result = {}
+    for step in steps:
+        result.update(_download(payload, torrent_files) if step == "download" else STEPS[step](payload))
+
+    # Mirror the session bookkeeping of the real script: a login happens only without cookies.
+    logged_in = bool(payload.get("username")) and not payload.get("cookies")
+    host = urlparse(payload["base_url"]).hostname
+    result.update({
+        "logged_in": logged_in,
+        "session_expired": False,
+        "cookies": [{"name": "PHPSESSID", "value": "bench", "domain": host, "path": "/"}] if logged_in else None,
+    })
+    return result
+
+
+class BrowserlessHandler(BaseHTTPRequestHandler):
+    latency = 1.0
+    failure_rate = 0.0
+    max_sessions = 10
+    function_path = "/function"
+    torrent_files = False
+    active = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/json/version":
+            self._reply(200, json.dumps({"Browser": "FakeChrome/120.0"}).encode())
+        else:
+            self._reply(404, b"{}")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        if urlparse(self.path).path != self.function_path:
+            self._reply(404, b'{"error": "not found"}')
+            return
+
+        cls = type(self)
+        with cls.lock:
+            if cls.active >= cls.max_sessions:
+                self._reply(429, b'{"error": "too many requests"}')
+                return
+            cls.active += 1
+
+        try:
+            # A browser session: launch, navigate, scrape.
+            time.sleep(max(0.0, random.gauss(self.latency, self.latency * 0.2)))
+            if random.random() < self.failure_rate:
+                self._reply(500, b'{"error": "session crashed"}')
+                return
+
+            script = json.loads(body)["code"] if self.headers.get("Content-Type", "").startswith("application/json") else body
+            self._reply(200, json.dumps(run_script(script, self.torrent_files)).encode())
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+def serve_browserless(latency: float = 1.0, failure_rate: float = 0.0, max_sessions: int = 10,
+                      function_path: str = "/function", torrent_files: bool = False):
+    return serve(BrowserlessHandler, latency=latency, failure_rate=failure_rate, max_sessions=max_sessions,
+                 function_path=function_path, torrent_files=torrent_files, active=0, lock=threading.Lock())
@@ -0,0 +1,117 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import hashlib
+import re
+import threading
+import time
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SEARCH_FIXTURE = (FIXTURES / "search.html").read_text()
+POST_FIXTURE = (FIXTURES / "post.html").read_text()
+
+PAGE_RE = re.compile(r"^/page/(\d+)/?$")
+# Queries containing these words get the site's "Nothing Found" page, or a
+# bot challenge that only a real browser gets past.
+MISS_WORD = "missing"
+CHALLENGE_WORD = "challenge"
+NO_RESULTS_PAGE = (
+    "<html><body><div id='content'><div class='post'><h2>Nothing Found</h2>"
+    "<p>Sorry, but you are looking for something that isn't here.</p></div></div></body></html>"
+)
+CHALLENGE_PAGE = "<html><head><title>Just a moment...</title></head><body><div id='cf-challenge'></div></body></html>"
+
+
+def render_search(page: int, last_page: int, query: str = "") -> str | None:
+    if MISS_WORD in query:
+        return NO_RESULTS_PAGE
+    if page > last_page:
+        return None
+    # Every page has distinct post paths so multi-page searches return new posts.
+    return SEARCH_FIXTURE.replace("-p1/", f"-p{page}/")
+
+
+def render_post(slug: str) -> str:
+    return POST_FIXTURE.replace("{info_hash}", info_hash(slug)).replace("{slug}", slug)
+
+
+def bencode(value) -> bytes:
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, list):
+        return b"l" + b"".join(bencode(item) for item in value) + b"e"
+    return b"d" + b"".join(bencode(key) + bencode(value[key]) for key in sorted(value)) + b"e"
+
+
+def torrent_info(slug: str) -> dict:
+    return {"length": 1024, "name": slug, "piece length": 16384, "pieces": b"0" * 20}
+
+
+def info_hash(slug: str) -> str:
+    # Same hash for the magnet link and the .torrent of a post, as on the real site.
+    return hashlib.sha1(bencode(torrent_info(slug))).hexdigest()
+
+
+def torrent_bytes(slug: str) -> bytes:
+    return bencode({"announce": "udp://tracker.opentrackr.org:1337/announce", "info": torrent_info(slug)})
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    last_page = 3
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str = "text/html; charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+
+        page_match = PAGE_RE.match(parsed.path)
+        if "s" in query and (parsed.path == "/" or page_match):
+            page = int(page_match.group(1)) if page_match else 1
+            if CHALLENGE_WORD in query["s"][0]:
+                self._reply(503, CHALLENGE_PAGE.encode())
+                return
+            body = render_search(page, self.last_page, query["s"][0])
+            if body is None:
+                self._reply(404, b"<html><body>Not Found</body></html>")
+            else:
+                self._reply(200, body.encode())
+            return
+
+        if parsed.path.startswith("/abss/"):
+            self._reply(200, render_post(parsed.path.strip("/").split("/")[-1]).encode())
+            return
+
+        if parsed.path.startswith("/downloads/") and parsed.path.endswith(".torrent"):
+            slug = parsed.path.rsplit("/", 1)[-1].removesuffix(".torrent")
+            self._reply(200, torrent_bytes(slug), "application/x-bittorrent")
+            return
+
+        self._reply(404, b"<html><body>Not Found</body></html>")
+
+
+def serve(handler_class, **attributes):
+    handler = type(handler_class.__name__, (handler_class,), attributes)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def serve_site(latency: float = 0.0, last_page: int = 3):
+    return serve(SiteHandler, latency=latency, last_page=last_page)
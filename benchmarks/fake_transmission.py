@@ -0,0 +1,123 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+
+from fake_site import info_hash, serve
+
+TORRENT_NAME_RE = re.compile(rb"4:name(\d+):")
+
+SESSION_ID = "bench-session"
+
+
+class FakeDaemon:
+    def __init__(self, torrents: int = 0):
+        self.lock = threading.Lock()
+        self.torrents: dict[int, dict] = {}
+        self.next_id = 1
+        for index in range(torrents):
+            self.add(f"seeded-{index}", hashlib.sha1(f"seeded-{index}".encode()).hexdigest(), done=index % 2 == 0)
+
+    def add(self, name: str, hash_string: str, done: bool = False) -> dict:
+        torrent = {
+            "id": self.next_id, "name": name, "hashString": hash_string,
+            "status": 6 if done else 4, "percentDone": 1.0 if done else 0.0, "eta": -1 if done else 3600,
+            "activityDate": int(time.time()),
+        }
+        self.torrents[self.next_id] = torrent
+        self.next_id += 1
+        return torrent
+
+    def torrent_get(self, arguments: dict) -> dict:
+        fields = arguments.get("fields") or ["id", "name", "hashString"]
+        ids = arguments.get("ids")
+        if ids == "recently-active":
+            selected = [torrent for torrent in self.torrents.values() if torrent["status"] != 6]
+        elif ids is None:
+            selected = list(self.torrents.values())
+        else:
+            wanted = set(ids if isinstance(ids, list) else [ids])
+            selected = [
+                torrent for torrent in self.torrents.values()
+                if torrent["id"] in wanted or torrent["hashString"] in wanted
+            ]
+
+        result = {"torrents": [{field: torrent.get(field) for field in fields} for torrent in selected]}
+        if ids == "recently-active":
+            result["removed"] = []
+        return result
+
+    def torrent_add(self, arguments: dict) -> dict:
+        if "metainfo" in arguments:
+            # Only torrents served by the fake site are expected here.
+            metainfo = base64.b64decode(arguments["metainfo"])
+            match = TORRENT_NAME_RE.search(metainfo)
+            name = metainfo[match.end():match.end() + int(match.group(1))].decode()
+            key = info_hash(name)
+        else:
+            filename = arguments["filename"]
+            query = parse_qs(urlparse(filename).query)
+            key = query.get("xt", [filename])[0].rsplit(":", 1)[-1].lower()
+            name = query.get("dn", [key])[0]
+
+        for torrent in self.torrents.values():
+            if torrent["hashString"] == key:
+                return {"torrent-duplicate": {field: torrent[field] for field in ("id", "name", "hashString")}}
+
+        torrent = self.add(name, key)
+        return {"torrent-added": {field: torrent[field] for field in ("id", "name", "hashString")}}
+
+    def handle(self, method: str, arguments: dict) -> dict:
+        with self.lock:
+            if method == "session-get":
+                return {"version": "4.0.5 (bench)", "rpc-version": 17, "rpc-version-semver": "5.3.0",
+                        "download-dir": "/downloads"}
+            if method == "torrent-get":
+                return self.torrent_get(arguments)
+            if method == "torrent-add":
+                return self.torrent_add(arguments)
+        raise KeyError(method)
+
+
+class TransmissionHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    daemon: FakeDaemon = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("X-Transmission-Session-Id") != SESSION_ID:
+            self._reply(409, {}, {"X-Transmission-Session-Id": SESSION_ID})
+            return
+
+        time.sleep(self.latency)
+        query = json.loads(body)
+        try:
+            arguments = self.daemon.handle(query["method"], query.get("arguments") or {})
+        except KeyError as e:
+            self._reply(200, {"result": f"method not supported: {e}", "arguments": {}})
+            return
+        self._reply(200, {"result": "success", "arguments": arguments, "tag": query.get("tag")})
+
+
+def serve_transmission(latency: float = 0.0, torrents: int = 0):
+    daemon = FakeDaemon(torrents)
+    server, url = serve(TransmissionHandler, latency=latency, daemon=daemon)
+    return server, url, daemon
@@ -0,0 +1,197 @@
+"""Offline benchmark for the request-book and direct-download flows.
+
+Starts a fake AudiobookBay site, a fake Browserless and a fake Transmission
+on localhost, points the bot's modules at them and drives both flows the way
+the slash commands do, at several concurrency levels.
+
+    python benchmarks/run.py --concurrency 1,4,16 --requests 32
+"""
+from pathlib import Path
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+from fake_browserless import serve_browserless
+from fake_site import serve_site
+from fake_transmission import serve_transmission
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="requests per flow and concurrency level")
+    parser.add_argument("--flows", default="request-book,direct-download")
+    parser.add_argument("--browserless-latency", type=float, default=0.5, help="seconds per browser session")
+    parser.add_argument("--site-latency", type=float, default=0.05, help="seconds per plain HTTP page")
+    parser.add_argument("--transmission-latency", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of Browserless calls that fail")
+    parser.add_argument("--max-sessions", type=int, default=10, help="Browserless concurrent session limit")
+    parser.add_argument("--torrents", type=int, default=200, help="torrents already in Transmission")
+    parser.add_argument("--browser-slots", type=int, default=2, help="BrowserScheduler concurrency")
+    parser.add_argument("--pages", type=int, default=1, help="search result pages per request")
+    parser.add_argument("--miss-every", type=int, default=4,
+                        help="every Nth request-book searches for a title the site doesn't have; 0 disables")
+    parser.add_argument("--challenge-every", type=int, default=5,
+                        help="every Nth request-book search gets a bot challenge over plain HTTP; 0 disables")
+    parser.add_argument("--mirrors", type=int, default=1, help="number of fake mirrors")
+    parser.add_argument("--fallback", action="store_true",
+                        help="serve /function on a non-default path so endpoint fallback is exercised")
+    parser.add_argument("--torrent-files", action="store_true",
+                        help="posts offer a .torrent download instead of a magnet link")
+    parser.add_argument("--no-direct", action="store_true", help="disable the plain HTTP fast path")
+    parser.add_argument("--warm", action="store_true", help="keep caches and sessions between runs")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+def configure(args):
+    site_urls = [serve_site(latency=args.site_latency, last_page=max(3, args.pages))[1] for _ in range(args.mirrors)]
+    _, browserless_url = serve_browserless(latency=args.browserless_latency, failure_rate=args.failure_rate,
+                                           max_sessions=args.max_sessions, torrent_files=args.torrent_files,
+                                           function_path="/chromium/function" if args.fallback else "/function")
+    transmission_server, _, daemon = serve_transmission(latency=args.transmission_latency, torrents=args.torrents)
+
+    # The bot reads its configuration at import time.
+    os.environ.update({
+        "ABB_MIRRORS": ",".join(site_urls),
+        "BROWSERLESS_URL": browserless_url,
+        "BROWSERLESS_TOKEN": "",
+        "TRANSMISSION_HOST": "127.0.0.1",
+        "TRANSMISSION_PORT": str(transmission_server.server_address[1]),
+        "TRANSMISSION_PASS": "",
+        "USERNAME": "bench",
+        "PASSWORD": "bench",
+        "DIRECT_HTTP": "false" if args.no_direct else "true",
+        "METRICS_PORT": "0",
+        "CACHE_DB_PATH": "",
+        "CATALOG_DB_PATH": "",
+        "USER_RATE_BURST": "1000",
+        "BROWSER_MAX_CONCURRENCY": str(args.browser_slots),
+    })
+    sys.path.insert(0, str(SCRIPTS))
+    return site_urls, daemon
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def run_level(flow, concurrency: int, requests: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(index: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                ok = await flow(index)
+            except Exception as e:
+                logging.debug(f"Request {index} failed: {e}")
+                ok = False
+            if ok:
+                latencies.append(time.monotonic() - started)
+            else:
+                failures += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return latencies, failures, time.monotonic() - started
+
+
+async def main(args):
+    site_urls, daemon = configure(args)
+
+    import cache
+    import rpa as r
+    from mirrors import MirrorPool
+    from scheduler import BrowserScheduler
+    from transmission import TransmissionClient
+
+    mirrors = MirrorPool()
+    transmission = TransmissionClient()
+
+    def rpa_for(base_url: str) -> r.WebsiteNavigationRPA:
+        return r.WebsiteNavigationRPA(username="bench", password="bench", base_url=base_url)
+
+    async def transfer(rpa: r.WebsiteNavigationRPA) -> bool:
+        # Same hand-off as BookSearch.add_to_transmission.
+        if rpa.magnet_link:
+            return await asyncio.to_thread(transmission.load_torrent, file_path=rpa.magnet_link) is not None
+        metainfo = await rpa.fetch_torrent_async()
+        return metainfo is not None and await asyncio.to_thread(transmission.load_torrent, metainfo=metainfo) is not None
+
+    def nth(every: int, index: int) -> bool:
+        return every > 0 and index % every == every - 1
+
+    async def request_book(scheduler: BrowserScheduler, index: int) -> bool:
+        user_id = index
+        miss = nth(args.miss_every, index)
+        if miss:
+            query = f"missing {index}"
+        elif nth(args.challenge_every, index):
+            query = f"challenge {index % 4}"
+        else:
+            query = f"book {index % 4}"
+
+        async def search():
+            await rpa_for(mirrors.primary).handle_login_async()
+            results = []
+            async for batch in mirrors.iter_search_results(rpa_for, query, pages=args.pages):
+                results.extend(batch)
+            return results
+
+        results = await scheduler.submit(user_id, search)
+        if miss:
+            # A miss succeeds by coming back empty.
+            return not results
+        if not results:
+            return False
+        title, url = results[index % len(results)]
+        rpa = rpa_for(mirrors.mirror_for(url) or mirrors.primary)
+        if not await scheduler.submit(user_id, rpa.process_post_by_url_async, title, url):
+            return False
+        return await transfer(rpa)
+
+    async def direct_download(scheduler: BrowserScheduler, index: int) -> bool:
+        rpa = rpa_for(site_urls[index % len(site_urls)])
+        rpa.current_url = f"{rpa.base_url}/abss/direct-{index % 8}/"
+        if not await scheduler.submit(index, rpa.process_post_page_async):
+            return False
+        return await transfer(rpa)
+
+    flows = {"request-book": request_book, "direct-download": direct_download}
+
+    print(f"{'flow':<16} {'conc':>4} {'ok':>4} {'fail':>4} {'p50 s':>8} {'p95 s':>8} {'req/s':>7}")
+    for name in args.flows.split(","):
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            if not args.warm:
+                cache.search_cache.clear()
+                cache.link_cache.clear()
+                r.WebsiteNavigationRPA._session_cookies.clear()
+            scheduler = BrowserScheduler(max_concurrency=args.browser_slots)
+            latencies, failures, elapsed = await run_level(
+                lambda index: flows[name](scheduler, index), concurrency, args.requests,
+            )
+            p50 = statistics.median(latencies) if latencies else float("nan")
+            p95 = percentile(latencies, 0.95) if latencies else float("nan")
+            print(f"{name:<16} {concurrency:>4} {len(latencies):>4} {failures:>4} "
+                  f"{p50:>8.3f} {p95:>8.3f} {len(latencies) / elapsed:>7.2f}")
+
+    print(f"\nTorrents in Transmission: {len(daemon.torrents)}")
+    print(f"Browserless endpoints: {r.WebsiteNavigationRPA.endpoint_metrics()}")
+    print(f"Caches: {cache.cache_stats()}")
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    logging.basicConfig(level=logging.DEBUG if arguments.verbose else logging.CRITICAL)
+    asyncio.run(main(arguments))
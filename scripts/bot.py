@@ -1,9 +1,11 @@
+import asyncio
 import os
 from interactions import *
 from interactions.api.events import Startup
 import logging
 from dotenv import load_dotenv
-import rpa as r
+import health
+import metrics
 
 load_dotenv()
 
@@ -26,14 +28,19 @@ async def on_ready():
     logger.info("Launching Book Sailor!")
 
 
+async def main(token: str):
+    # Backend checks run alongside the gateway login; a backend that is down
+    # shows up as not ready instead of keeping the bot offline.
+    checks = asyncio.create_task(health.run_checks())
+    try:
+        await bot.astart(token)
+    finally:
+        checks.cancel()
+
+
 if __name__ == '__main__':
     DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
-    browserless_ok, browserless_message = r.WebsiteNavigationRPA.verify_browserless_connection()
-    if not browserless_ok:
-        logger.error(f"Browserless startup check failed: {browserless_message}")
-        raise SystemExit(1)
-
-    logger.info(browserless_message)
+    metrics.start_metrics_server()
     logger.info("Loading Commands...")
     bot.load_extension('default_commands')
-    bot.start(DISCORD_TOKEN)
+    asyncio.run(main(DISCORD_TOKEN))
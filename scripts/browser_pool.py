@@ -0,0 +1,303 @@
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse
+
+import asyncio
+import logging
+import threading
+
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError, async_playwright
+
+logger = logging.getLogger(__name__)
+
+VIEWPORT = {"width": 1440, "height": 1024}
+# Cookie fields Playwright accepts; Puppeteer's come with a few more.
+COOKIE_FIELDS = ("name", "value", "domain", "path", "expires", "httpOnly", "secure", "sameSite")
+
+
+def _playwright_cookies(cookies: list[dict]) -> list[dict]:
+    converted = []
+    for cookie in cookies:
+        cookie = {field: cookie[field] for field in COOKIE_FIELDS if cookie.get(field) is not None}
+        if cookie.get("sameSite") not in ("Strict", "Lax", "None"):
+            cookie.pop("sameSite", None)
+        if cookie.get("expires", 0) < 0:
+            cookie.pop("expires")
+        if "name" in cookie and "value" in cookie and "domain" in cookie:
+            converted.append(cookie)
+    return converted
+
+
+class _WarmContext:
+    # One long-lived browser context and page, logged in once per site and
+    # reused until it has served max_uses actions or failed.
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.lean = False
+        self.blocked_types: set[str] = set()
+        self.blocked_domains: list[str] = []
+        self.logged_in: set[str] = set()
+
+    @classmethod
+    async def open(cls, browser, user_agent: str) -> "_WarmContext":
+        context = await browser.new_context(user_agent=user_agent, viewport=VIEWPORT)
+        warm = cls(context, await context.new_page())
+        await context.route("**/*", warm._route)
+        return warm
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except PlaywrightError as e:
+            logger.debug(f"Could not close browser context: {e}")
+
+    async def _route(self, route):
+        # Same rules as the lean mode of the /function script.
+        request = route.request
+        if self.lean and (request.resource_type in self.blocked_types or self._blocked_host(request.url)):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _blocked_host(self, url: str) -> bool:
+        host = urlparse(url).hostname or ""
+        return any(host == domain or host.endswith(f".{domain}") for domain in self.blocked_domains)
+
+    async def run(self, payload: dict) -> dict:
+        # Mirrors the /function script, step for step, on the warm page.
+        self.blocked_types = set(payload["blocked_resource_types"])
+        self.blocked_domains = payload["blocked_domains"]
+        run = _Run(self, payload)
+        steps = payload.get("steps") if payload["action"] == "pipeline" else [payload["action"]]
+        merged = {}
+        for name in steps:
+            merged.update(await run.step(name))
+        return {**merged, **(await run.session_state())}
+
+
+class _Run:
+    def __init__(self, warm: _WarmContext, payload: dict):
+        self.warm = warm
+        self.page = warm.page
+        self.payload = payload
+        self.site = payload["base_url"]
+        self.has_credentials = bool(payload["username"] and payload["password"])
+        self.logged_in = False
+        self.session_expired = False
+        self.session_ready = False
+
+    async def step(self, name: str) -> dict:
+        handler = getattr(self, f"_{name}", None)
+        if name not in ("login", "search", "post_info", "download") or handler is None:
+            raise ValueError(f"Unsupported action: {name}")
+        self.warm.lean = name in self.payload["lean_steps"]
+        return await handler()
+
+    async def _maybe_login(self) -> bool:
+        if not self.has_credentials:
+            return False
+
+        previous_lean = self.warm.lean
+        self.warm.lean = "login" in self.payload["lean_steps"]
+        try:
+            await self.page.goto(self.payload["login_url"], wait_until="domcontentloaded")
+            if not await self.page.query_selector('input.login-input[name="username"]'):
+                return False
+
+            await self.page.fill('input.login-input[name="username"]', self.payload["username"])
+            await self.page.fill('input.login-input[type="password"]', self.payload["password"])
+            try:
+                async with self.page.expect_navigation(wait_until="domcontentloaded", timeout=10000):
+                    await self.page.click(".login-button")
+            except PlaywrightTimeoutError:
+                pass
+
+            self.logged_in = "/member/users/" in self.page.url
+            if self.logged_in:
+                self.warm.logged_in.add(self.site)
+            return self.logged_in
+        finally:
+            self.warm.lean = previous_lean
+
+    async def _looks_logged_out(self) -> bool:
+        logout_link = await self.page.query_selector('a[href*="logout"]')
+        login_link = await self.page.query_selector('a[href*="/member/login.php"]')
+        return not logout_link and bool(login_link)
+
+    async def _ensure_session(self):
+        # A context that already logged in to this site keeps its cookies, so
+        # only a fresh context needs the cached cookies or a login.
+        if self.session_ready:
+            return
+        self.session_ready = True
+
+        if self.site in self.warm.logged_in:
+            return
+        cookies = _playwright_cookies(self.payload["cookies"])
+        if cookies:
+            await self.warm.context.add_cookies(cookies)
+            self.warm.logged_in.add(self.site)
+        else:
+            await self._maybe_login()
+
+    async def _open_page(self, url: str):
+        await self._ensure_session()
+        if self.page.url == url:
+            return
+
+        await self.page.goto(url, wait_until="domcontentloaded")
+        known_session = self.site in self.warm.logged_in
+        if self.has_credentials and known_session and not self.logged_in and await self._looks_logged_out():
+            self.session_expired = True
+            self.warm.logged_in.discard(self.site)
+            if await self._maybe_login():
+                await self.page.goto(url, wait_until="domcontentloaded")
+
+    async def _wait_for(self, selector: str, timeout: float):
+        try:
+            await self.page.wait_for_selector(selector, timeout=timeout)
+        except PlaywrightTimeoutError:
+            pass
+
+    async def session_state(self) -> dict:
+        return {
+            "logged_in": self.logged_in,
+            "session_expired": self.session_expired,
+            "cookies": await self.warm.context.cookies() if self.logged_in else None,
+        }
+
+    async def _login(self) -> dict:
+        await self._ensure_session()
+        return {"current_url": self.page.url}
+
+    async def _search(self) -> dict:
+        await self._open_page(self.payload["search_url"])
+        await self._wait_for("div.post", 10000)
+        results = await self.page.eval_on_selector_all("div.post", """(posts) =>
+            posts.map((post) => {
+              const link = post.querySelector('.postTitle h2 a');
+              return link ? { title: link.textContent.trim(), url: link.href } : null;
+            }).filter(Boolean)""")
+        return {"results": results, "current_url": self.page.url}
+
+    async def _post_info(self) -> dict:
+        await self._open_page(self.payload["url"])
+        await self._wait_for('h1[itemprop="name"]', 10000)
+        info = await self.page.evaluate("""() => ({
+            title: document.querySelector('h1[itemprop="name"]')?.textContent?.trim() ?? null,
+            author: document.querySelector('span.author')?.textContent?.trim() ?? null,
+        })""")
+        return {**info, "current_url": self.page.url}
+
+    async def _download(self) -> dict:
+        await self._open_page(self.payload["url"])
+
+        magnet_link = None
+        magnet_button = await self.page.query_selector('[id*="magnetLink"]')
+        if magnet_button:
+            await magnet_button.click()
+            await self._wait_for("#magnetIcon", 5000)
+            icon = await self.page.query_selector("#magnetIcon")
+            magnet_link = await icon.get_attribute("href") if icon else None
+
+        torrent_url = None
+        if not magnet_link:
+            torrent_button = await self.page.query_selector("xpath=//a[contains(text(), 'Torrent Free Downloads')]")
+            if torrent_button:
+                torrent_url = await torrent_button.get_attribute("href")
+
+        return {"magnet_link": magnet_link, "torrent_url": torrent_url, "current_url": self.page.url}
+
+
+class BrowserPool:
+    # A few warm contexts on one persistent CDP connection to Browserless.
+    # Playwright runs on its own event loop thread; callers on the Browserless
+    # executor block on the result like they do on a /function POST.
+    def __init__(self, ws_url: str, size: int = 2, max_uses: int = 50):
+        self.ws_url = ws_url
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+        self._thread.start()
+        self._playwright = None
+        self._browser = None
+        self._idle: list[_WarmContext] = []
+        # Created on the pool's loop.
+        self._slots: asyncio.Semaphore | None = None
+        self._connect_lock: asyncio.Lock | None = None
+
+    def run(self, payload: dict, timeout: float) -> dict:
+        future = asyncio.run_coroutine_threadsafe(self._run(payload), self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Warm browser action {payload['action']} timed out after {timeout:.0f}s")
+
+    def prewarm(self, payload: dict, timeout: float) -> list[dict]:
+        # Fill every slot with a context that has already run the login step.
+        async def fill():
+            return await asyncio.gather(*(self._run(payload) for _ in range(self.size)))
+        return asyncio.run_coroutine_threadsafe(fill(), self._loop).result(timeout)
+
+    async def _run(self, payload: dict) -> dict:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+            self._connect_lock = asyncio.Lock()
+
+        async with self._slots:
+            warm = await self._acquire(payload["user_agent"])
+            healthy = False
+            try:
+                result = await warm.run(payload)
+                healthy = True
+                return result
+            except PlaywrightError as e:
+                # Like the /function script, a page failing on a live connection
+                # is reported as data; the context is still recycled.
+                if self._browser is None or not self._browser.is_connected():
+                    raise
+                return {"error": str(e), "current_url": warm.page.url}
+            finally:
+                await self._release(warm, healthy)
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+
+            await self._disconnect()
+            logger.info("Opening a persistent CDP connection to Browserless")
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.connect_over_cdp(self.ws_url)
+
+    async def _disconnect(self):
+        self._idle.clear()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _acquire(self, user_agent: str) -> _WarmContext:
+        await self._connect()
+        if self._idle:
+            return self._idle.pop()
+        logger.info("Opening a warm browser context")
+        return await _WarmContext.open(self._browser, user_agent)
+
+    async def _release(self, warm: _WarmContext, healthy: bool):
+        warm.uses += 1
+        connected = self._browser is not None and self._browser.is_connected()
+        if healthy and connected and warm.uses < self.max_uses:
+            self._idle.append(warm)
+            return
+
+        logger.info(f"Recycling browser context after {warm.uses} uses" + ("" if healthy else " and an error"))
+        await warm.close()
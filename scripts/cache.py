@@ -0,0 +1,177 @@
+from collections import OrderedDict
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class TTLCache:
+    # metered=False keeps a store (like per-interaction state) out of the
+    # cache lookup metric, where it would skew the hit rate.
+    def __init__(self, name: str, max_size: int = 256, ttl: float = 3600, db_path: str | None = None,
+                 metered: bool = True):
+        self.name = name
+        self.metered = metered
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(namespace TEXT, key TEXT, expires_at REAL, value TEXT, PRIMARY KEY (namespace, key))"
+            )
+            self._db.commit()
+
+    def get(self, key: str, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count("hit")
+                    return value
+                del self._entries[key]
+
+            value = self._load(key)
+            if value is _MISSING:
+                self._count("miss")
+                return default
+
+            value, remaining = value
+            self._count("hit")
+            self._store(key, value, ttl=remaining)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._store(key, value)
+            self._save(key, value)
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._delete(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return default
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.name,))
+                self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        # A presence check on the in-memory entries, not a lookup: no stats, no recency bump.
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    # Internals, callers must hold the lock ----------------
+
+    def _count(self, result: str):
+        if result == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.metered:
+            metrics.CACHE_LOOKUPS.labels(cache=self.name, result=result).inc()
+
+    def _store(self, key: str, value: Any, ttl: float | None = None):
+        now = time.monotonic()
+        self._entries[key] = (now + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+
+        # Drop expired entries from the cold end, then enforce the size bound.
+        while self._entries:
+            oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[oldest_key]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str):
+        if not self._db:
+            return _MISSING
+
+        row = self._db.execute(
+            "SELECT expires_at, value FROM cache WHERE namespace = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        if not row:
+            return _MISSING
+
+        expires_at, value = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            self._delete(key)
+            return _MISSING
+        return json.loads(value), remaining
+
+    def _save(self, key: str, value: Any):
+        if not self._db:
+            return
+
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (self.name, key, time.time() + self.ttl, json.dumps(value)),
+            )
+            self._db.commit()
+        except (TypeError, sqlite3.Error) as e:
+            logger.warning(f"Could not persist {self.name} cache entry: {e}")
+
+    def _delete(self, key: str):
+        if self._db:
+            self._db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.name, key))
+            self._db.commit()
+
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "21600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH") or None
+
+# Normalized search query -> list of (title, url)
+search_cache = TTLCache("search", max_size=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, db_path=CACHE_DB_PATH)
+# Post url -> download result (magnet link or torrent url, plus post title/author when known)
+link_cache = TTLCache("link", max_size=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, db_path=CACHE_DB_PATH)
+
+
+def cache_stats() -> dict[str, dict[str, Any]]:
+    return {"search": search_cache.stats(), "link": link_cache.stats()}
@@ -0,0 +1,196 @@
+from urllib.parse import urlparse
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from infohash import magnet_infohash
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", os.path.join("data", "booksailor.db"))
+# A local match needs at least this score to be shown, and this many fresh
+# ones answer a search without going to the site.
+CATALOG_MIN_SCORE = float(os.getenv("CATALOG_MIN_SCORE", "0.6"))
+CATALOG_MIN_MATCHES = int(os.getenv("CATALOG_MIN_MATCHES", "3"))
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "86400"))
+MAX_CANDIDATES = 200
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(word: str) -> set[str]:
+    # Padded like pg_trgm, so short words and word starts still get trigrams.
+    padded = f"  {word} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def acronym(words: list[str]) -> str:
+    # "He Who Fights With Monsters 11" -> "hwfwm", so "HWFWM 11" finds it.
+    return "".join(word[0] for word in words if not word.isdigit())
+
+
+def post_path(url: str) -> str:
+    # The same post has the same path on every mirror.
+    return urlparse(url).path.rstrip("/")
+
+
+def _similarity(left: set[str], right: set[str]) -> float:
+    return len(left & right) / len(left | right) if left and right else 0.0
+
+
+class _Post:
+    def __init__(self, post_id: int, title: str, url: str, last_seen: float):
+        self.id = post_id
+        self.title = title
+        self.url = url
+        self.last_seen = last_seen
+        self.words = tokenize(title)
+        self.word_set = set(self.words)
+        self.acronym = acronym(self.words)
+        self.numbers = {int(word) for word in self.words if word.isdigit()}
+        self.word_trigrams = {word: trigrams(word) for word in self.word_set}
+        self.trigrams = set().union(*self.word_trigrams.values(), trigrams(self.acronym) if self.acronym else set())
+
+    def word_score(self, word: str) -> float:
+        if word.isdigit():
+            return 1.0 if int(word) in self.numbers else 0.0
+        if word in self.word_set:
+            return 1.0
+        if len(word) >= 3 and any(title_word.startswith(word) for title_word in self.word_set):
+            return 0.9
+        if len(word) >= 3 and word in self.acronym:
+            return 0.9
+        query_trigrams = trigrams(word)
+        return max((_similarity(query_trigrams, grams) for grams in self.word_trigrams.values()), default=0.0)
+
+    def score(self, words: list[str], query_trigrams: set[str]) -> float:
+        # Asking for volume 11 rules out every other volume, however close the
+        # rest of the title is, or they would answer the search in its place.
+        if any(int(word) not in self.numbers for word in words if word.isdigit()):
+            return 0.0
+        word_score = sum(self.word_score(word) for word in words) / len(words)
+        coverage = len(query_trigrams & self.trigrams) / len(query_trigrams)
+        return 0.8 * word_score + 0.2 * coverage
+
+
+def match_score(query: str, title: str) -> float:
+    # The catalog's ranking for a single title, for results that come from elsewhere.
+    words = tokenize(query)
+    if not words:
+        return 0.0
+    return _Post(0, title, "", 0).score(words, set().union(*(trigrams(word) for word in words)))
+
+
+class Catalog:
+    # Every post the bot has seen in search results or opened, so repeat
+    # searches can be answered without scraping. Rows live in SQLite, the
+    # trigram index is rebuilt in memory when the database is first used.
+    def __init__(self, db_path: str | None = CATALOG_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = None
+        self._posts: dict[int, _Post] = {}
+        self._index: dict[str, set[int]] = {}
+
+    def __len__(self):
+        return len(self._posts)
+
+    def add_results(self, results: list[tuple[str, str]]):
+        for title, url in results:
+            self.record(url, title=title)
+
+    def record(self, url: str, title: str | None = None, author: str | None = None,
+               magnet_link: str | None = None, torrent_url: str | None = None, info_hash: str | None = None):
+        now = time.time()
+        info_hash = info_hash or magnet_infohash(magnet_link)
+        try:
+            with self._lock:
+                self._open()
+                self._db.execute(
+                    "INSERT INTO posts (path, url, title, author, magnet_link, torrent_url, info_hash,"
+                    " first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (path) DO UPDATE SET url = excluded.url,"
+                    " title = COALESCE(excluded.title, title), author = COALESCE(excluded.author, author),"
+                    " magnet_link = COALESCE(excluded.magnet_link, magnet_link),"
+                    " torrent_url = COALESCE(excluded.torrent_url, torrent_url),"
+                    " info_hash = COALESCE(excluded.info_hash, info_hash), last_seen = excluded.last_seen",
+                    (post_path(url), url, title, author, magnet_link, torrent_url, info_hash, now, now),
+                )
+                post_id, title = self._db.execute(
+                    "SELECT id, title FROM posts WHERE path = ?", (post_path(url),)
+                ).fetchone()
+                self._db.commit()
+                if title:
+                    self._index_post(_Post(post_id, title, url, now))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not add {url} to the catalog: {e}")
+
+    def search(self, query: str, limit: int = 50) -> tuple[list[tuple[str, str]], bool]:
+        # Returns the (title, url) matches, best first, and whether there are
+        # enough recently seen ones to skip the live search.
+        words = tokenize(query)
+        if not words:
+            return [], False
+
+        query_trigrams = set().union(*(trigrams(word) for word in words))
+        with self._lock:
+            self._open()
+            shared: dict[int, int] = {}
+            for gram in query_trigrams:
+                for post_id in self._index.get(gram, ()):
+                    shared[post_id] = shared.get(post_id, 0) + 1
+            candidates = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+            scored = [(post.score(words, query_trigrams), post)
+                      for post in (self._posts[post_id] for post_id in candidates)]
+
+        matches = sorted(((score, post) for score, post in scored if score >= CATALOG_MIN_SCORE),
+                         key=lambda match: match[0], reverse=True)[:limit]
+        fresh_after = time.time() - CATALOG_REFRESH_SECONDS
+        fresh = sum(1 for _, post in matches if post.last_seen >= fresh_after)
+        return [(post.title, post.url) for _, post in matches], fresh >= CATALOG_MIN_MATCHES
+
+    # Internals, callers must hold the lock ----------------
+
+    def _open(self):
+        # Opened on first use, so importing the module touches no files.
+        if self._db is not None:
+            return
+        if self.db_path and os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL UNIQUE, url TEXT NOT NULL, title TEXT,"
+            " author TEXT, magnet_link TEXT, torrent_url TEXT, info_hash TEXT,"
+            " first_seen REAL NOT NULL, last_seen REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS posts_info_hash ON posts (info_hash);"
+        )
+        self._db.commit()
+
+        for post_id, title, url, last_seen in self._db.execute(
+                "SELECT id, title, url, last_seen FROM posts WHERE title IS NOT NULL"):
+            self._index_post(_Post(post_id, title, url, last_seen))
+        if self._posts:
+            logger.info(f"Loaded {len(self._posts)} posts into the local catalog.")
+
+    def _index_post(self, post: _Post):
+        previous = self._posts.get(post.id)
+        if previous is not None:
+            for gram in previous.trigrams:
+                self._index[gram].discard(post.id)
+        self._posts[post.id] = post
+        for gram in post.trigrams:
+            self._index.setdefault(gram, set()).add(post.id)
+
+
+catalog = Catalog()
@@ -1,9 +1,22 @@
 import asyncio
+import math
 import os
+import re
+import time
+from urllib.parse import urlparse
 from interactions import *
 from interactions.api.events import *
+import health
+import metrics
 import rpa as r
+from cache import TTLCache, link_cache
+from catalog import CATALOG_MIN_SCORE, catalog, match_score, post_path
+from mirrors import MirrorPool
+from scheduler import BrowserScheduler, RateLimited
 import logging
+from infohash import magnet_infohash, metainfo_infohash
+from jobs import FINISHED, REMOVED, JobStore
+from tracker import FINISHED_STATUSES, CompletionTracker
 from transmission import TransmissionClient
 from dotenv import load_dotenv
 
@@ -11,50 +24,434 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+MENU_TIMEOUT_SECONDS = 120
+MENU_MAX_SESSIONS = 256
+# Discord caps a select menu at 25 options.
+MENU_PAGE_SIZE = 25
+SEARCH_PAGES = int(os.getenv('SEARCH_PAGES', '3'))
+MAX_SEARCH_PAGES = 5
+# Top results resolved to magnet/torrent links in the background while the menu is open.
+PREFETCH_RESULTS = int(os.getenv('PREFETCH_RESULTS', '3'))
+# /request-series resolves at most BULK_MAX_POSTS posts, BULK_CONCURRENCY at a time.
+BULK_MAX_POSTS = int(os.getenv('BULK_MAX_POSTS', '25'))
+BULK_CONCURRENCY = int(os.getenv('BULK_CONCURRENCY', '3'))
+PROGRESS_UPDATE_SECONDS = 2
+# Failures that only mean "not right now"; retry_later_message words the reply.
+RETRY_LATER_ERRORS = (RateLimited, r.BrowserlessBusyError, r.CircuitOpenError)
+
 
 class BookSearch(Extension):
     def __init__(self, bot):
-        self.rpa = None
-        self.book_result = []
-        self.active_torrents = []
-        self.latest_torrent = None
+        # Per-menu search state keyed by the token embedded in the component custom_ids.
+        self.sessions = TTLCache("menus", max_size=MENU_MAX_SESSIONS, ttl=MENU_TIMEOUT_SECONDS,
+                                 metered=False)
+        self.scheduler = BrowserScheduler()
+        self.mirrors = MirrorPool()
+        self.transmission = TransmissionClient()
+        self.tracker = CompletionTracker(self.transmission)
+        self.jobs = JobStore()
+        metrics.ACTIVE_TORRENTS.set_function(lambda: len(self.tracker))
+        metrics.QUEUED_REQUESTS.set_function(lambda: self.scheduler.queued)
+        self._completion_task = None
+        # Running downloads keyed by post URL and by infohash.
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Post URLs whose background resolution is already in the browser.
+        self._prefetching: set[str] = set()
 
     # Functions --------------
-    async def book_search_rpa(self, query: str):
-        self.rpa = r.WebsiteNavigationRPA(username=os.getenv('USERNAME'), password=os.getenv('PASSWORD'),
-                                          base_url="https://audiobookbay.lu", download_dir=os.getenv('DOWNLOAD_DIR'))
-        self.rpa.nav_login_page()
-        self.rpa.handle_login()
-        results = self.rpa.get_search_result_titles(query)
-        return results
-
-    @Task.create(trigger=IntervalTrigger(minutes=1))
-    async def tor_status_check(self):
-        latest = self.latest_torrent
-        if latest or self.active_torrents:
-            logger.info(f"Verifying is torrents: {latest} or any of the {len(self.active_torrents)} active torrents has finished downloading...")
-            t = TransmissionClient()
-            torrents = t.get_torrents()
-            approved_torrent_list = []
-            for tor in torrents:
-                current_status = tor.status
-                approved = {"seeding", "seed pending"}
-                if current_status in approved:
-                    logger.debug(f"Finished Torrent Found! {tor.name}")
-                    approved_torrent_list.append(tor.name)
-
-            if latest in approved_torrent_list or any(t in approved_torrent_list for t in self.active_torrents):
-                await self.bot.owner.send(f"Download finished for {approved_torrent_list[0]}")
-                self.latest_torrent = None
-                self.active_torrents = [
-                    t for t in self.active_torrents
-                    if t not in approved_torrent_list
-                ]
-            else:
-                logger.info(f"Torrent {latest} is still downloading...")
-
-            if len(self.active_torrents) < 1:
-                self.tor_status_check.stop()
+    @staticmethod
+    def rpa_for(base_url: str) -> r.WebsiteNavigationRPA:
+        return r.WebsiteNavigationRPA(username=os.getenv('USERNAME'), password=os.getenv('PASSWORD'),
+                                      base_url=base_url)
+
+    async def book_search_rpa(self, ctx: SlashContext, token: str, session: dict, pages: int, message=None):
+        rpa = self.rpa_for(self.mirrors.primary)
+        rpa.nav_login_page()
+        await rpa.handle_login_async()
+
+        # Grow the menu as each live result page lands.
+        async for batch in self.mirrors.iter_search_results(self.rpa_for, session["query"], pages=pages):
+            if self.add_results(session, batch):
+                message = await self.publish_results(ctx, token, session, message)
+
+        return session["results"]
+
+    @staticmethod
+    def add_results(session: dict, results: list[tuple[str, str]]) -> int:
+        # Live results for posts the catalog already showed are skipped.
+        seen = {post_path(url) for _, url in session["results"].values()}
+        added = 0
+        for title, url in results:
+            path = post_path(url)
+            if path in seen:
+                continue
+            seen.add(path)
+            session["results"][str(len(session["results"]) + 1)] = (title, url)
+            added += 1
+        return added
+
+    async def publish_results(self, ctx: SlashContext, token: str, session: dict, message=None):
+        # The menu is stored once, so it expires with its Discord message. Later
+        # pages grow the same session and leave a used or cancelled menu alone.
+        if message is None:
+            self.sessions.set(token, session)
+        elif token not in self.sessions:
+            return message
+        self.prefetch(session)
+        content = f"Found **{len(session['results'])}** results for **{session['query']}**"
+        if message is None:
+            return await ctx.send(content=content, components=self.book_menu(token, session),
+                                  delete_after=MENU_TIMEOUT_SECONDS)
+        await ctx.edit(message, content=content, components=self.book_menu(token, session))
+        return message
+
+    @staticmethod
+    def book_menu(token: str, session: dict) -> list[ActionRow]:
+        results = list(session["results"].items())
+        page_count = max(1, math.ceil(len(results) / MENU_PAGE_SIZE))
+        page = session["page"] = max(0, min(session["page"], page_count - 1))
+        start = page * MENU_PAGE_SIZE
+
+        options = [
+            StringSelectOption(label=title if len(title) <= 100 else f"{title[:97]}...", value=value)
+            for value, (title, _) in results[start:start + MENU_PAGE_SIZE]
+        ]
+
+        buttons = []
+        if page_count > 1:
+            buttons += [
+                Button(style=ButtonStyle.GREY, label="Previous", custom_id=f"book_page_prev:{token}",
+                       disabled=page == 0),
+                Button(style=ButtonStyle.GREY, label="Next", custom_id=f"book_page_next:{token}",
+                       disabled=page >= page_count - 1),
+            ]
+        buttons.append(Button(style=ButtonStyle.RED, label="Cancel", custom_id=f"cancel_button:{token}"))
+
+        return [
+            ActionRow(
+                StringSelectMenu(
+                    options,  # NOQA
+                    min_values=1,
+                    max_values=1,
+                    placeholder=f"Page {page + 1}/{page_count}" if page_count > 1 else "",
+                    custom_id=f'book_select_menu:{token}'
+                )
+            ),
+            ActionRow(*buttons),
+        ]
+
+    def prefetch(self, session: dict):
+        # Resolve the top results while the user is still choosing, so picking
+        # one only has to hand its link to Transmission.
+        if PREFETCH_RESULTS <= 0:
+            return
+        if not session["prefetch"]:
+            asyncio.get_running_loop().call_later(MENU_TIMEOUT_SECONDS, self.cancel_prefetch, session)
+
+        for title, url in list(session["results"].values())[:PREFETCH_RESULTS]:
+            if url not in session["prefetch"]:
+                session["prefetch"][url] = asyncio.create_task(self.prefetch_link(title, url))
+
+    async def prefetch_link(self, title: str, url: str):
+        if link_cache.get(url) is not None:
+            return
+
+        async def resolve():
+            self._prefetching.add(url)
+            try:
+                rpa = self.rpa_for(self.mirrors.mirror_for(url) or self.mirrors.primary)
+                return await rpa.process_post_by_url_async(title, url)
+            finally:
+                self._prefetching.discard(url)
+
+        try:
+            # Takes a browser slot only when no user is waiting for one.
+            resolved = await self.scheduler.submit_background(resolve)
+        except asyncio.CancelledError:
+            # Cancelling drops a prefetch still in the queue. One already in the
+            # browser runs to the end and still fills the link cache.
+            metrics.PREFETCHES.labels(result="abandoned" if url in self._prefetching else "cancelled").inc()
+            raise
+        except Exception as e:
+            logger.info(f"Could not resolve {url} ahead of time: {e}")
+            resolved = None
+        metrics.PREFETCHES.labels(result="resolved" if resolved else "failed").inc()
+
+    @staticmethod
+    def cancel_prefetch(session: dict, keep: str | None = None):
+        for url, task in session["prefetch"].items():
+            if url != keep:
+                task.cancel()
+
+    @staticmethod
+    def retry_later_message(error: Exception, doing: str = "downloading") -> str:
+        if isinstance(error, RateLimited):
+            return f"You're {doing} too quickly, please try again in {error.retry_after:.0f} seconds."
+        if isinstance(error, r.BrowserlessBusyError):
+            return "The book browser is busy right now, please try again in a minute."
+        return "The book browser is unavailable right now, please try again in a few minutes."
+
+    def queue_notifier(self, ctx):
+        async def notify(position: int):
+            await ctx.edit(content=f"Browser is busy, you are number **{position}** in the queue...")
+        return notify
+
+    async def coalesced(self, key: str, factory):
+        # Concurrent requests for the same key share one task. The shield keeps
+        # one waiter's cancellation from cancelling it for the others. Returns
+        # the task's result and whether this caller joined someone else's task.
+        task = self._inflight.get(key)
+        joined = task is not None
+        if not joined:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"Joining in-flight request for {key}")
+        return await asyncio.shield(task), joined
+
+    def claim(self, key: str) -> tuple[asyncio.Future, bool]:
+        # Like coalesced, for work the caller finishes later by setting the
+        # returned future itself. Returns the key's future and whether someone
+        # else already holds it.
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, True
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future, False
+
+    async def download_post(self, user_id: int, post_url: str, resolve, on_position=None, resolved: bool = False,
+                            **kwargs):
+        # Returns (rpa, torrent, already_present); torrent is None when nothing could be added.
+        rpa = self.rpa_for(self.mirrors.mirror_for(post_url) or self.mirrors.primary)
+        rpa.driver.get(post_url)
+        if resolved:
+            # The link is cached, so resolving it needs no browser slot.
+            outcome = await resolve(rpa, **kwargs)
+        else:
+            outcome = await self.scheduler.submit(user_id, resolve, rpa, on_position=on_position, **kwargs)
+        if not outcome:
+            return rpa, None, False
+
+        # Magnets go straight to Transmission; .torrent files are fetched into
+        # memory for this request only and sent as metainfo.
+        metainfo = None
+        if rpa.magnet_link:
+            info_hash = magnet_infohash(rpa.magnet_link)
+        else:
+            metainfo = await rpa.fetch_torrent_async()
+            if metainfo is None:
+                return rpa, None, False
+            info_hash = metainfo_infohash(metainfo)
+            if info_hash:
+                await asyncio.to_thread(catalog.record, post_url, info_hash=info_hash)
+
+        if info_hash is None:
+            return rpa, await self.add_to_transmission(rpa, metainfo), False
+        (torrent, already_present), joined = await self.coalesced(
+            f"hash:{info_hash}", lambda: self.add_unless_present(info_hash, rpa, metainfo))
+        return rpa, torrent, already_present or joined
+
+    async def add_unless_present(self, info_hash: str, rpa: r.WebsiteNavigationRPA, metainfo: bytes | None):
+        existing = await asyncio.to_thread(self.transmission.find_torrent, info_hash)
+        if existing is not None:
+            logger.info(f"Torrent {info_hash} is already in Transmission as {existing.name}")
+            return existing, True
+        return await self.add_to_transmission(rpa, metainfo), False
+
+    async def add_to_transmission(self, rpa: r.WebsiteNavigationRPA, metainfo: bytes | None = None):
+        if metainfo is not None:
+            return await asyncio.to_thread(self.transmission.load_torrent, metainfo=metainfo)
+        return await asyncio.to_thread(self.transmission.load_torrent, file_path=rpa.magnet_link)
+
+    async def announce_download(self, ctx, title: str, torrent, already_present: bool):
+        # A torrent someone else just added only carries id, name and hash, so it isn't finished.
+        if already_present and "status" in torrent.fields and torrent.status in FINISHED_STATUSES:
+            await ctx.send(content=f"**{title}** is already on the server!")
+            return
+
+        await self.track_download(torrent, ctx.user.id, title)
+        if already_present:
+            await ctx.send(content=f"**{title}** is already downloading, you'll get a message when it's done.")
+            return
+
+        c = self.transmission
+        await ctx.send(content=f"Download has begun for **{title}**")
+        await self.bot.owner.send(
+            f"User **{ctx.user.display_name}** has started the download for {title}. Please visit {c.host}:{c.port}.")
+        logger.info("Transmission sequence complete!")
+
+    async def track_download(self, torrent, user_id: int | None, title: str | None = None):
+        info_hash = torrent.fields.get("hashString")
+        self.tracker.track(torrent.id, torrent.name, user_id, info_hash)
+        await asyncio.to_thread(self.jobs.record, user_id, title or torrent.name, info_hash, torrent.id)
+        self.watch_completions()
+
+    def watch_completions(self):
+        if self._completion_task is None or self._completion_task.done():
+            self._completion_task = asyncio.create_task(self.completion_watch())
+
+    async def completion_watch(self):
+        # Poll faster while a torrent is close to done and stop once nothing is tracked.
+        while (interval := self.tracker.next_interval()) is not None:
+            await asyncio.sleep(interval)
+            polled = await asyncio.to_thread(self.tracker.poll)
+            if polled is None:
+                continue
+            finished, removed = polled
+            for tor in finished:
+                await self.finish_download(tor)
+            for tor in removed:
+                if tor.info_hash:
+                    await asyncio.to_thread(self.jobs.set_state, tor.info_hash, REMOVED)
+
+    async def finish_download(self, tor):
+        await self.notify_finished(tor)
+        if tor.info_hash:
+            await asyncio.to_thread(self.jobs.set_state, tor.info_hash, FINISHED)
+
+    @listen(Startup)
+    async def restore_downloads(self):
+        jobs = await asyncio.to_thread(self.jobs.pending)
+        if not jobs:
+            return
+
+        logger.info(f"Restoring {len(jobs)} download jobs from the job store...")
+        restored = await asyncio.to_thread(self.tracker.restore, jobs)
+        if restored is None:
+            # Transmission is unreachable; the jobs stay pending for the next start.
+            logger.error("Could not restore download jobs, Transmission did not answer.")
+            return
+
+        finished, missing = restored
+        for info_hash in missing:
+            logger.warning(f"Torrent {info_hash} is no longer in Transmission, dropping its job.")
+            await asyncio.to_thread(self.jobs.set_state, info_hash, REMOVED)
+        for tor in finished:
+            await self.finish_download(tor)
+        self.watch_completions()
+
+    @listen(Startup)
+    async def warm_browser(self):
+        await self.rpa_for(self.mirrors.primary).prewarm_async()
+
+    async def notify_finished(self, tor):
+        logger.info(f"Download finished for {tor.name}")
+        try:
+            for user_id in tor.user_ids - {self.bot.owner.id}:
+                user = await self.bot.fetch_user(user_id)
+                if user:
+                    await user.send(f"Your download **{tor.name}** has finished!")
+            await self.bot.owner.send(f"Download finished for {tor.name}")
+        except Exception as e:
+            logger.error(f"Could not send completion notice for {tor.name}. {e}")
+
+    async def find_series(self, user_id: int, series: str, pages: int) -> list[tuple[str, str]]:
+        # Catalog matches first, then live results whose titles match the series as closely.
+        session = {"results": {}}
+        local, covered = await asyncio.to_thread(catalog.search, series, BULK_MAX_POSTS)
+        self.add_results(session, local)
+        if covered:
+            return list(session["results"].values())
+
+        async def live_search():
+            rpa = self.rpa_for(self.mirrors.primary)
+            await rpa.handle_login_async()
+            async for batch in self.mirrors.iter_search_results(self.rpa_for, series, pages=pages):
+                self.add_results(session, [(title, url) for title, url in batch
+                                           if match_score(series, title) >= CATALOG_MIN_SCORE])
+
+        await self.scheduler.submit(user_id, live_search)
+        return list(session["results"].values())
+
+    async def resolve_posts(self, posts: list[tuple[str | None, str]], on_resolved=None) -> list[tuple]:
+        # Resolves every post to (title, rpa, metainfo, info_hash), BULK_CONCURRENCY
+        # at a time on the shared Browserless executor. Posts that failed have
+        # neither a magnet link nor metainfo.
+        slots = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def resolve(title: str | None, url: str):
+            rpa = self.rpa_for(self.mirrors.mirror_for(url) or self.mirrors.primary)
+            try:
+                async with slots:
+                    rpa.driver.get(url)
+                    if not await rpa.process_post_page_async():
+                        return title or url, rpa, None, None
+
+                    metainfo = None
+                    if rpa.magnet_link:
+                        info_hash = magnet_infohash(rpa.magnet_link)
+                    else:
+                        metainfo = await rpa.fetch_torrent_async()
+                        if metainfo is None:
+                            return rpa.title or title or url, rpa, None, None
+                        info_hash = metainfo_infohash(metainfo)
+                        if info_hash:
+                            await asyncio.to_thread(catalog.record, url, info_hash=info_hash)
+                    return rpa.title or title or url, rpa, metainfo, info_hash
+            except Exception as e:
+                logger.error(f"Could not resolve {url}: {e}")
+                return title or url, rpa, None, None
+            finally:
+                if on_resolved:
+                    await on_resolved()
+
+        return await asyncio.gather(*(resolve(title, url) for title, url in posts))
+
+    async def add_posts(self, resolved: list[tuple]) -> list[tuple]:
+        # Adds the resolved posts' torrents in one batched pass and returns
+        # (torrent, already_present) for each; torrent is None for posts that
+        # failed. A torrent another request is already adding is joined, and
+        # the batch's own torrents can be joined by /request-book while it runs.
+        outcomes: list[tuple] = [(None, False)] * len(resolved)
+        batch, claims, joins = [], {}, {}
+        for index, (_, rpa, metainfo, info_hash) in enumerate(resolved):
+            if not rpa.magnet_link and metainfo is None:
+                continue
+            if info_hash:
+                claim, joined = self.claim(f"hash:{info_hash}")
+                if joined:
+                    joins[index] = claim
+                    continue
+                claims[index] = claim
+            batch.append(index)
+
+        try:
+            loaded = await asyncio.to_thread(
+                self.transmission.load_torrents,
+                [(resolved[index][3], resolved[index][1].magnet_link, resolved[index][2]) for index in batch])
+            for index, outcome in zip(batch, loaded):
+                outcomes[index] = outcome
+        finally:
+            for index, claim in claims.items():
+                claim.set_result(outcomes[index])
+
+        for index, task in joins.items():
+            try:
+                torrent, _ = await asyncio.shield(task)
+            except Exception as e:
+                logger.error(f"Could not join the in-flight add for {resolved[index][0]}: {e}")
+                continue
+            outcomes[index] = torrent, True
+        return outcomes
+
+    def progress_reporter(self, ctx, message, total: int):
+        # Edits one progress message, at most every PROGRESS_UPDATE_SECONDS.
+        state = {"done": 0, "edited": 0.0}
+
+        async def report():
+            state["done"] += 1
+            now = time.monotonic()
+            if state["done"] < total and now - state["edited"] < PROGRESS_UPDATE_SECONDS:
+                return
+            state["edited"] = now
+            try:
+                await ctx.edit(message, content=f"Resolving books... **{state['done']}/{total}**")
+            except Exception as e:
+                logger.warning(f"Could not update bulk progress. {e}")
+        return report
 
     # Commands
 
@@ -63,103 +460,194 @@ class BookSearch(Extension):
     @slash_option(name="book",
                   description="Book Title. Please be as accurate as possible ex: 'HWFWM 11', and not just 'HWFWM'.",
                   opt_type=OptionType.STRING, required=True)
-    async def get_book(self, ctx: SlashContext, book: str):
-        await ctx.defer()
-        options = []
-
-        results = await self.book_search_rpa(book)
-        is_valid = False
-
-        if results:
-            count = 0
-            for title, url in results:
-                count += 1
-                if len(title) <= 100:
-                    options.append(StringSelectOption(label=title, value=str(count)))
-                    self.book_result.append({"id": count, "title": title, "url": url})
-                    is_valid = True
-
-            # Components
-            components: list[ActionRow] = [
-                ActionRow(
-                    StringSelectMenu(
-                        options,  # NOQA
-                        min_values=1,
-                        max_values=1,
-                        placeholder="",
-                        custom_id='book_select_menu'
-                    )
-                ),
-                ActionRow(
-                    Button(
-                        style=ButtonStyle.RED,
-                        label="Cancel",
-                        custom_id="cancel_button"
-                    )
-                )
-
-            ]
-
-            if is_valid:
-                await ctx.send(components=components, delete_after=120)
-            else:
-                await ctx.send("Results were inconclusive, please try another title!", ephemeral=True)
-
-        else:
-            await ctx.send(
-                "No results found! Please try another title. Please try visiting the source [website](<https://audiobookbay.lu>) for more results. "
-                "Note if you find the desired book, use the `/direct-download` command and paste the url of the book page.",
-                ephemeral=True)
+    @slash_option(name="pages", description=f"Number of result pages to search (default {SEARCH_PAGES}).",
+                  opt_type=OptionType.INTEGER, required=False, min_value=1, max_value=MAX_SEARCH_PAGES)
+    async def get_book(self, ctx: SlashContext, book: str, pages: int = SEARCH_PAGES):
+        with metrics.COMMAND_SECONDS.labels(command="request-book").time():
+            await ctx.defer()
+
+            # Posts seen before are shown straight away; the site is only
+            # searched when the catalog has too few recent matches.
+            token = str(ctx.id)
+            session = {"user_id": ctx.user.id, "query": book, "results": {}, "page": 0, "prefetch": {}}
+            local, covered = await asyncio.to_thread(catalog.search, book)
+            message = None
+            if self.add_results(session, local):
+                message = await self.publish_results(ctx, token, session)
+            metrics.CATALOG_SEARCHES.labels(result="hit" if covered else "partial" if local else "miss").inc()
+            if covered:
+                logger.info(f"Answered search for {book} from the catalog with {len(local)} results")
+                return
+
+            error = None
+            try:
+                # Once the catalog's menu is up, queue updates would overwrite it.
+                results = await self.scheduler.submit(ctx.user.id, self.book_search_rpa, ctx, token, session, pages,
+                                                      message, on_position=None if message else self.queue_notifier(ctx))
+            except RETRY_LATER_ERRORS as e:
+                error = self.retry_later_message(e, "searching")
+
+            if error:
+                if message is None:
+                    await ctx.send(error, ephemeral=True)
+                else:
+                    logger.info(f"Live search for {book} skipped, showing catalog results only: {error}")
+                return
+
+            if not results:
+                await ctx.send(
+                    f"No results found! Please try another title. Please try visiting the source [website](<{self.mirrors.primary}>) for more results. "
+                    "Note if you find the desired book, use the `/direct-download` command and paste the url of the book page.",
+                    ephemeral=True)
 
     @slash_command(name="direct-download",
                    description="Use an accepted url format to directly download a book.")
     @slash_option(name='url', description='URL of the book you want to download.', opt_type=OptionType.STRING,
                   required=True)
     async def url_download_comm(self, ctx: SlashContext, url: str):
-        from urllib.parse import urlparse
+        with metrics.COMMAND_SECONDS.labels(command="direct-download").time():
+            await ctx.defer()
+            accepted_urls = self.mirrors.domains()
+            logger.info(f"URL Provided: {url}")
+
+            parsed_url = urlparse(url)
+            domain = parsed_url.netloc.lower().replace('www.', '')
+
+            if domain in accepted_urls:
+                logger.info(f'URL Accepted: {url}')
+                try:
+                    (rpa, torrent, already_present), joined = await self.coalesced(
+                        f"post:{post_path(url)}",
+                        lambda: self.download_post(ctx.user.id, url, r.WebsiteNavigationRPA.process_post_page_async,
+                                                   on_position=self.queue_notifier(ctx)))
+                    logger.info(f"Successfully navigated to post: {rpa.title}, Author: {rpa.author}")
 
-        await ctx.defer()
-        accepted_urls = ['audiobookbay.lu']
-        logger.info(f"URL Provided: {url}")
-
-        parsed_url = urlparse(url)
-        domain = parsed_url.netloc.lower().replace('www.', '')
-
-        if domain in accepted_urls:
-            logger.info(f'URL Accepted: {url}')
-            try:
-                self.rpa = r.WebsiteNavigationRPA(username=os.getenv('USERNAME'), password=os.getenv('PASSWORD'),
-                                                  base_url="https://audiobookbay.lu",
-                                                  download_dir=os.getenv('DOWNLOAD_DIR'))
-                self.rpa.nav_login_page()
-                self.rpa.handle_login()
-                self.rpa.driver.get(url)
-                self.rpa.get_post_info()
-                post_title = self.rpa.title
-                post_author = self.rpa.author
-                logger.info(f"Successfully navigated to post: {post_title}, Author: {post_author}")
-                outcome = self.rpa.process_download_page()
-
-                if self.rpa.magnet_link or outcome:
-                    # Quit chrome session
-                    # self.rpa.quit_current_session()
-
-                    # Start transmission sequence
-                    c = TransmissionClient()
-                    torrent = c.load_torrent(file_path=self.rpa.magnet_link)
                     if torrent:
-                        self.latest_torrent = torrent.name
-                        self.active_torrents.append(torrent.name)
-                        self.tor_status_check.start()
-                        await ctx.send(content=f"Download has begun for **{self.rpa.title}**")
-                        await self.bot.owner.send(
-                            f"User **{ctx.user.display_name}** has started the download for {self.rpa.title}. Please visit {c.host}:{c.port}.")
-                        logger.info("Transmission sequence complete!")
-
-            except Exception as e:
-                print(e)
-        else:
-            await ctx.send(f'Unsupported URL format provided! URL must include {accepted_urls}', ephemeral=True)
+                        await self.announce_download(ctx, rpa.title, torrent, already_present or joined)
+                    elif rpa.magnet_link or rpa.torrent_url:
+                        logger.error("Could not add the torrent to Transmission.")
+                        await ctx.send(
+                            f'An error occured while attempting to transfer the book **{rpa.title or url}** to the server, please reach out to the server owner for more details.')
+                    else:
+                        await ctx.send(content=f"Could not download: **{url}**. Please visit logs for more information.")
+
+                except RETRY_LATER_ERRORS as e:
+                    await ctx.send(self.retry_later_message(e), ephemeral=True)
+                except Exception as e:
+                    logger.error(f"Could not download {url}! {e}")
+                    await ctx.send(content=f"Could not download: **{url}**. Please visit logs for more information.")
+            else:
+                await ctx.send(f'Unsupported URL format provided! URL must include {accepted_urls}', ephemeral=True)
+
+    @slash_command(name="request-series",
+                   description="Download a whole series, or a list of book URLs, in one go.")
+    @slash_option(name="series", description="Series name, ex: 'He Who Fights With Monsters'.",
+                  opt_type=OptionType.STRING, required=False)
+    @slash_option(name="urls", description="Book page URLs, separated by spaces or commas.",
+                  opt_type=OptionType.STRING, required=False)
+    @slash_option(name="pages", description=f"Number of result pages to search (default {SEARCH_PAGES}).",
+                  opt_type=OptionType.INTEGER, required=False, min_value=1, max_value=MAX_SEARCH_PAGES)
+    async def bulk_download(self, ctx: SlashContext, series: str | None = None, urls: str | None = None,
+                            pages: int = SEARCH_PAGES):
+        with metrics.COMMAND_SECONDS.labels(command="request-series").time():
+            await ctx.defer()
+
+            if urls:
+                posts = [(None, url) for url in dict.fromkeys(re.split(r"[\s,]+", urls)) if url]
+                if not posts:
+                    await ctx.send("Please paste at least one book URL.", ephemeral=True)
+                    return
+                rejected = [url for _, url in posts if self.mirrors.mirror_for(url) is None]
+                if rejected:
+                    await ctx.send(f"Unsupported URL format provided: {', '.join(rejected)}. "
+                                   f"URLs must include {self.mirrors.domains()}", ephemeral=True)
+                    return
+                label = f"{len(posts)} books"
+            elif series:
+                label = series
+                try:
+                    posts = await self.find_series(ctx.user.id, series, pages)
+                except RETRY_LATER_ERRORS as e:
+                    await ctx.send(self.retry_later_message(e, "searching"), ephemeral=True)
+                    return
+            else:
+                await ctx.send("Please give a series name or a list of book URLs.", ephemeral=True)
+                return
+
+            if not posts:
+                await ctx.send(f"No results found for **{series}**! Please try another name or paste the book URLs.",
+                               ephemeral=True)
+                return
+            posts = posts[:BULK_MAX_POSTS]
+
+            # Posts go through the same in-flight map as /request-book: one
+            # someone else is fetching is joined, and this batch's can be joined.
+            claims = {url: self.claim(f"post:{post_path(url)}") for _, url in posts}
+            own = [(title, url) for title, url in posts if not claims[url][1]]
+
+            # One scheduler turn for the whole batch. The fan-out inside it is
+            # bounded by BULK_CONCURRENCY and by the process-wide session cap.
+            message = await ctx.send(f"Resolving books... **0/{len(own)}**")
+            outcomes = {}
+            try:
+                resolved = await self.scheduler.submit(ctx.user.id, self.resolve_posts, own,
+                                                       self.progress_reporter(ctx, message, len(own)))
+                loaded = await self.add_posts(resolved)
+                for (_, url), (title, rpa, *_), (torrent, already_present) in zip(own, resolved, loaded):
+                    outcomes[url] = title, torrent, already_present
+                    claims[url][0].set_result((rpa, torrent, already_present))
+            except RETRY_LATER_ERRORS as e:
+                await ctx.edit(message, content=self.retry_later_message(e))
+                return
+            finally:
+                # Nothing this batch claimed may be left for others to wait on.
+                for url, (claim, joined) in claims.items():
+                    if not joined and not claim.done():
+                        claim.set_result((self.rpa_for(self.mirrors.mirror_for(url) or self.mirrors.primary), None, False))
+
+            for title, url in posts:
+                claim, joined = claims[url]
+                if not joined:
+                    continue
+                try:
+                    rpa, torrent, _ = await asyncio.shield(claim)
+                except Exception as e:
+                    logger.error(f"Could not join the in-flight request for {url}: {e}")
+                    rpa, torrent = None, None
+                outcomes[url] = (rpa and rpa.title) or title or url, torrent, True
+
+            added, downloading, on_server, failed = [], [], [], []
+            for title, torrent, already_present in (outcomes[url] for _, url in posts):
+                if torrent is None:
+                    failed.append(title)
+                elif already_present and "status" in torrent.fields and torrent.status in FINISHED_STATUSES:
+                    on_server.append(title)
+                else:
+                    await self.track_download(torrent, ctx.user.id, title)
+                    (downloading if already_present else added).append(title)
+
+            lines = [f"Finished **{label}**: {len(added)} started, {len(downloading)} already downloading, "
+                     f"{len(on_server)} already on the server, {len(failed)} failed."]
+            if failed:
+                # Keeps the summary inside Discord's message length limit.
+                shown = ", ".join(f"**{title}**" for title in failed[:10])
+                more = f" and {len(failed) - 10} more" if len(failed) > 10 else ""
+                lines.append(f"Could not download: {shown}{more}")
+            if added or downloading:
+                lines.append("You'll get a message as each one finishes.")
+            await ctx.edit(message, content="\n".join(lines))
+
+            if added:
+                c = self.transmission
+                await self.bot.owner.send(
+                    f"User **{ctx.user.display_name}** has started {len(added)} downloads for {label}. "
+                    f"Please visit {c.host}:{c.port}.")
+
+    @slash_command(name="bot-status", description="Check whether the book browser and the download server are up.")
+    async def bot_status(self, ctx: SlashContext):
+        await ctx.defer(ephemeral=True)
+        readiness = await health.run_checks()
+        await ctx.send(readiness.summary(), ephemeral=True)
 
     # Callbacks ----------------
 
@@ -167,91 +655,77 @@ class BookSearch(Extension):
     async def on_component(self, event: Component):
         ctx = event.ctx
 
-        match ctx.custom_id:
+        custom_id, _, token = ctx.custom_id.partition(":")
+
+        match custom_id:
             # Book selector from book search command
             case "book_select_menu":
+                session = self.sessions.pop(token)
+                if session is None:
+                    await ctx.send("This menu has expired, please search again!", ephemeral=True)
+                    return
 
+                await ctx.defer()
                 selection = ctx.values
                 for value in selection:
                     logger.info(f'Book Selected: {selection}')
-                    results = self.book_result
-                    for result in results:
-                        int_id = result.get('id')
-                        url = result.get('url')
-                        title = result.get('title')
-
-                        if int(int_id) == int(value):
-                            # RPA Process
-                            outcome = self.rpa.process_post_by_url(title=title, url=url)
-                            # Check if using a magnet link
-                            if self.rpa.magnet_link or outcome:
-
-                                try:
-                                    # Start transmission sequence
-                                    c = TransmissionClient()
-                                    torrent = c.load_torrent(file_path=self.rpa.magnet_link)
-                                    if torrent:
-                                        self.latest_torrent = torrent.name
-                                        self.tor_status_check.start()
-                                        await ctx.send(content=f"Download has begun for **{title}**")
-                                        await self.bot.owner.send(
-                                            f"User **{ctx.user.display_name}** has started the download for {title}. Please visit {c.host}:{c.port}.")
-                                        logger.info("Transmission sequence complete!")
-                                    else:
-                                        logger.error("Could not download torrent using magnet link.")
-
-                                        await ctx.send(
-                                            f'An error occured while attempting to transfer the book **{title}** to the server, please reach out to the server owner for more details.')
-                                        return
-
-                                except Exception as e:
-                                    logger.error(f"Could not download Torrent! {e}")
-
-                            # Check if file is downloaded
-                            elif self.rpa.files_downloaded:
-                                logger.info("Attempting to transfer torrent to transmission...")
-                                dir_items = os.scandir(self.rpa.download_dir)
-                                for entry in dir_items:
-                                    # Quit chrome session
-                                    # self.rpa.quit_current_session()
-                                    try:
-                                        # Start transmission sequence
-                                        c = TransmissionClient()
-                                        torrent = c.load_torrent(file_path=entry.path)
-                                        if torrent:
-                                            self.latest_torrent = torrent.name
-                                            self.tor_status_check.start()
-                                            # Give the system a moment to upload the file
-                                            await asyncio.sleep(0.5)
-                                            logger.info("File uploaded to transmission, removing from directory!")
-                                            os.remove(entry.path)
-                                            # Send owner a message
-                                            self.active_torrents.append(torrent.name)
-                                            await ctx.send(content=f"Download has begun for **{title}**")
-                                            await self.bot.owner.send(
-                                                f"User **{ctx.user.display_name}** has started the download for {title}. Please visit {c.host}:{c.port}.")
-                                            logger.info("Transmission sequence complete!")
-
-                                        else:
-                                            logger.warning("Removing file to avoid duplicates.")
-                                            os.remove(entry.path)
-
-                                            await ctx.send(
-                                                f'An error occured while attempting to transfer the book **{title}** to the server, please reach out to the server owner for more details.')
-                                            return
-                                    except Exception as e:
-                                        logger.error(f"Could not download torrent. {e}")
-
-                            else:
-                                await ctx.send(
-                                    content=f"Could not download: **{title}**. Please visit logs for more information.")
-                                # Quit chrome session
-                                # self.rpa.quit_current_session()
+                    result = session["results"].get(value)
+                    if result is None:
+                        continue
+
+                    title, url = result
+                    # Only the chosen result's background resolution is worth waiting for,
+                    # and only once it is in the browser; a queued one would wait behind users.
+                    self.cancel_prefetch(session, keep=url if url in self._prefetching else None)
+                    prefetched = session["prefetch"].get(url)
+                    if prefetched is not None:
+                        await asyncio.wait({prefetched})
+                    resolved = link_cache.get(url) is not None
+                    if prefetched is not None and resolved:
+                        metrics.PREFETCHES.labels(result="used").inc()
+
+                    # RPA Process; a post someone else is already fetching is joined, not repeated.
+                    try:
+                        (rpa, torrent, already_present), joined = await self.coalesced(
+                            f"post:{post_path(url)}",
+                            lambda: self.download_post(ctx.user.id, url, r.WebsiteNavigationRPA.process_post_by_url_async,
+                                                       on_position=self.queue_notifier(ctx), resolved=resolved,
+                                                       title=title, url=url))
+                    except RETRY_LATER_ERRORS as e:
+                        await ctx.send(self.retry_later_message(e), ephemeral=True)
+                        return
+                    except Exception as e:
+                        logger.error(f"Could not download Torrent! {e}")
+                        torrent, rpa = None, None
+
+                    if torrent:
+                        await self.announce_download(ctx, title, torrent, already_present or joined)
+                    # Magnet link or .torrent URL found but Transmission didn't take it
+                    elif rpa is not None and (rpa.magnet_link or rpa.torrent_url):
+                        logger.error("Could not add the torrent to Transmission.")
+
+                        await ctx.send(
+                            f'An error occured while attempting to transfer the book **{title}** to the server, please reach out to the server owner for more details.')
+                        return
+                    else:
+                        await ctx.send(
+                            content=f"Could not download: **{title}**. Please visit logs for more information.")
+
+            case "book_page_prev" | "book_page_next":
+                session = self.sessions.get(token)
+                if session is None:
+                    await ctx.send("This menu has expired, please search again!", ephemeral=True)
+                    return
+
+                session["page"] += 1 if custom_id == "book_page_next" else -1
+                await ctx.edit_origin(components=self.book_menu(token, session))
 
             case "cancel_button":
                 await ctx.edit_origin()
                 await ctx.delete()
-                self.book_result = []
+                session = self.sessions.pop(token)
+                if session is not None:
+                    self.cancel_prefetch(session)
 
                 # try:
                 # Quit chrome session
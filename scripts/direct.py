@@ -0,0 +1,115 @@
+from urllib.parse import quote_plus, urljoin
+
+import logging
+import os
+import threading
+
+import requests
+from lxml import html
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DIRECT_HTTP_ENABLED = os.getenv("DIRECT_HTTP", "true").strip().lower() not in ("0", "false", "no", "off")
+DIRECT_HTTP_TIMEOUT = float(os.getenv("DIRECT_HTTP_TIMEOUT", "10"))
+
+CHALLENGE_STATUS_CODES = {403, 429, 503}
+CHALLENGE_MARKERS = (
+    "cf-challenge",
+    "challenge-platform",
+    "cf_chl_",
+    "<title>Just a moment",
+    "g-recaptcha",
+    "h-captcha",
+)
+# What the site's own search page says when nothing matched.
+NO_RESULTS_MARKERS = (
+    "Not Found",
+    "Nothing Found",
+    "isn't here",
+    "No posts found",
+)
+
+# One pooled session and cookie jar for every direct request.
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_cookies_lock = threading.Lock()
+
+
+class FallbackRequired(Exception):
+    pass
+
+
+def search_url(base_url: str, query: str, page: int = 1) -> str:
+    if page > 1:
+        return f"{base_url}/page/{page}/?s={quote_plus(query)}"
+    return f"{base_url}/?s={quote_plus(query)}"
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+SEARCH_RESULT_XPATH = f"//div[{_has_class('post')}]//*[{_has_class('postTitle')}]//h2//a"
+
+
+class DirectHttpClient:
+    def __init__(self, base_url: str, user_agent: str, cookies: list[dict] | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.user_agent = user_agent
+        if cookies:
+            self.load_cookies(cookies)
+
+    @staticmethod
+    def load_cookies(cookies: list[dict]):
+        # Cookies come from the Browserless session in Puppeteer's format.
+        with _cookies_lock:
+            for cookie in cookies:
+                _session.cookies.set(cookie["name"], cookie["value"],
+                                     domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    def _get(self, url: str, allow_missing: bool = False):
+        response = _session.get(url, headers={"User-Agent": self.user_agent}, timeout=DIRECT_HTTP_TIMEOUT)
+        if allow_missing and response.status_code == 404:
+            return None
+        if response.status_code in CHALLENGE_STATUS_CODES:
+            raise FallbackRequired(f"HTTP {response.status_code} from {url}")
+        response.raise_for_status()
+
+        text = response.text
+        if any(marker in text for marker in CHALLENGE_MARKERS):
+            raise FallbackRequired(f"Challenge page served for {url}")
+
+        document = html.fromstring(text)
+        document.make_links_absolute(response.url)
+        return document
+
+    def search(self, query: str, page: int = 1) -> list[dict]:
+        url = search_url(self.base_url, query, page)
+        # Result pages past the last one are a plain 404.
+        document = self._get(url, allow_missing=page > 1)
+        if document is None:
+            return []
+
+        links = document.xpath(SEARCH_RESULT_XPATH)
+        if not links:
+            # A miss, or an empty page past the last one, is an answer. Anything
+            # else without posts may need JS, so the browser gets to decide.
+            text = document.text_content()
+            if page > 1 or any(marker in text for marker in NO_RESULTS_MARKERS):
+                return []
+            raise FallbackRequired(f"No posts in direct search response for {query}")
+
+        return [
+            {"title": link.text_content().strip(), "url": urljoin(self.base_url, link.get("href", ""))}
+            for link in links
+        ]
+
+    def torrent(self, url: str) -> bytes:
+        response = _session.get(url, headers={"User-Agent": self.user_agent}, timeout=DIRECT_HTTP_TIMEOUT)
+        response.raise_for_status()
+        # A bencoded torrent is a dictionary; anything else is a login or error page.
+        if not response.content.startswith(b"d"):
+            raise ValueError(f"{url} did not return a torrent file")
+        return response.content
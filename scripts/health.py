@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+import time
+
+import metrics
+import rpa as r
+from transmission import TransmissionClient
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+# Each check takes a timeout and returns (ok, detail) without launching a browser.
+CHECKS = {
+    "browserless": r.WebsiteNavigationRPA.probe_browserless,
+    "transmission": lambda timeout: TransmissionClient().health(timeout),
+}
+
+
+class Readiness:
+    def __init__(self):
+        self.status: dict[str, tuple[bool, str]] = {}
+        self.checked_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.status) and all(ok for ok, _ in self.status.values())
+
+    def update(self, backend: str, ok: bool, detail: str):
+        self.status[backend] = (ok, detail)
+        self.checked_at = time.time()
+        metrics.BACKEND_READY.labels(backend=backend).set(1 if ok else 0)
+
+    def summary(self) -> str:
+        if not self.status:
+            return "Health checks have not run yet."
+        lines = [f"**{backend}**: {'ready' if ok else 'not ready'} ({detail})"
+                 for backend, (ok, detail) in sorted(self.status.items())]
+        return "\n".join(lines)
+
+
+readiness = Readiness()
+
+
+async def _check(name: str, check, timeout: float):
+    try:
+        # The check's own timeout should fire first; this is the backstop.
+        ok, detail = await asyncio.wait_for(asyncio.to_thread(check, timeout), timeout * 2)
+    except asyncio.TimeoutError:
+        ok, detail = False, f"no answer within {timeout * 2:.0f}s"
+    except Exception as e:
+        ok, detail = False, str(e)
+
+    readiness.update(name, ok, detail)
+    if ok:
+        logger.info(detail)
+    else:
+        logger.error(f"{name} health check failed: {detail}")
+
+
+async def run_checks(timeout: float = HEALTH_CHECK_TIMEOUT) -> Readiness:
+    started = time.monotonic()
+    await asyncio.gather(*(_check(name, check, timeout) for name, check in CHECKS.items()))
+    state = "ready" if readiness.ready else "degraded"
+    logger.info(f"Health checks finished in {time.monotonic() - started:.2f}s, bot is {state}.")
+    return readiness
@@ -0,0 +1,56 @@
+from urllib.parse import parse_qs, urlparse
+
+import base64
+import hashlib
+import re
+
+BTIH_RE = re.compile(r"^urn:btih:([0-9a-fA-F]{40}|[A-Za-z2-7]{32})$")
+
+
+def magnet_infohash(magnet: str | None) -> str | None:
+    if not magnet or not magnet.startswith("magnet:"):
+        return None
+
+    for topic in parse_qs(urlparse(magnet).query).get("xt", []):
+        match = BTIH_RE.match(topic)
+        if match:
+            value = match.group(1)
+            # Older magnets carry the infohash base32 encoded.
+            if len(value) == 32:
+                return base64.b32decode(value.upper()).hex()
+            return value.lower()
+    return None
+
+
+def _skip(data: bytes, index: int) -> int:
+    # Returns the offset just past the bencoded value starting at index.
+    kind = data[index:index + 1]
+    if kind == b"i":
+        return data.index(b"e", index) + 1
+    if kind in (b"l", b"d"):
+        index += 1
+        while data[index:index + 1] != b"e":
+            index = _skip(data, index)
+        return index + 1
+    colon = data.index(b":", index)
+    return colon + 1 + int(data[index:colon])
+
+
+def metainfo_infohash(metainfo: bytes | None) -> str | None:
+    # The infohash is the SHA-1 of the info dictionary exactly as encoded,
+    # so it is sliced out of the original bytes rather than re-encoded.
+    if not metainfo or metainfo[:1] != b"d":
+        return None
+
+    try:
+        index = 1
+        while metainfo[index:index + 1] != b"e":
+            value_start = _skip(metainfo, index)
+            key = metainfo[metainfo.index(b":", index) + 1:value_start]
+            value_end = _skip(metainfo, value_start)
+            if key == b"info":
+                return hashlib.sha1(metainfo[value_start:value_end]).hexdigest()
+            index = value_end
+    except (ValueError, IndexError, RecursionError):
+        return None
+    return None
@@ -0,0 +1,68 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The data directory is a volume in the Docker image, so jobs outlive the container.
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("data", "booksailor.db"))
+
+DOWNLOADING = "downloading"
+FINISHED = "finished"
+REMOVED = "removed"
+
+
+class JobStore:
+    # Every download request the bot is waiting on, so completion notices
+    # survive a restart.
+    def __init__(self, db_path: str | None = JOB_DB_PATH):
+        self._lock = threading.Lock()
+        if db_path and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL keeps the writes cheap and lets a backup or sqlite3 shell read alongside the bot.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, title TEXT, info_hash TEXT,"
+            " torrent_id INTEGER, state TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);"
+            # One open job per user and torrent, however often they ask for it.
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_open ON jobs (user_id, info_hash) WHERE state = 'downloading';"
+        )
+        self._db.commit()
+
+    def record(self, user_id: int | None, title: str, info_hash: str | None, torrent_id: int):
+        now = time.time()
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO jobs (user_id, title, info_hash, torrent_id, state, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, title, info_hash, torrent_id, DOWNLOADING, now, now),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record download job for {title}: {e}")
+
+    def set_state(self, info_hash: str, state: str, torrent_id: int | None = None):
+        try:
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, torrent_id = COALESCE(?, torrent_id), updated_at = ?"
+                    " WHERE info_hash = ? AND state = ?",
+                    (state, torrent_id, time.time(), info_hash, DOWNLOADING),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not mark job {info_hash} as {state}: {e}")
+
+    def pending(self) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT * FROM jobs WHERE state = ? AND info_hash IS NOT NULL ORDER BY created_at", (DOWNLOADING,)
+            ).fetchall()
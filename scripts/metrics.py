@@ -0,0 +1,63 @@
+import logging
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = os.getenv("METRICS_PORT", "9108")
+
+# Browserless runs take seconds, Transmission and plain HTTP calls milliseconds.
+SLOW_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 90, 120)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+BROWSERLESS_ACTION_SECONDS = Histogram(
+    "booksailor_browserless_action_seconds", "Browserless /function call latency by action.",
+    ["action"], buckets=SLOW_BUCKETS,
+)
+DIRECT_HTTP_SECONDS = Histogram(
+    "booksailor_direct_http_seconds", "Plain HTTP fast path latency by action.",
+    ["action"], buckets=FAST_BUCKETS,
+)
+TRANSMISSION_RPC_SECONDS = Histogram(
+    "booksailor_transmission_rpc_seconds", "Transmission RPC latency by method.",
+    ["method"], buckets=FAST_BUCKETS,
+)
+COMMAND_SECONDS = Histogram(
+    "booksailor_command_seconds", "End-to-end slash command latency.",
+    ["command"], buckets=SLOW_BUCKETS,
+)
+
+ENDPOINT_FALLBACKS = Counter(
+    "booksailor_browserless_endpoint_fallbacks_total", "Browserless calls that had to leave the remembered endpoint.",
+)
+LOGIN_RETRIES = Counter(
+    "booksailor_login_retries_total", "Logins repeated because a cached AudiobookBay session had expired.",
+)
+CACHE_LOOKUPS = Counter(
+    "booksailor_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"],
+)
+CATALOG_SEARCHES = Counter(
+    "booksailor_catalog_searches_total", "Searches by whether the local catalog answered them fully, partly or not at all.",
+    ["result"],
+)
+PREFETCHES = Counter(
+    "booksailor_prefetches_total", "Background link resolutions for displayed results by outcome.", ["result"],
+)
+FAILURES = Counter(
+    "booksailor_failures_total", "Failed backend calls.", ["backend"],
+)
+
+ACTIVE_TORRENTS = Gauge("booksailor_active_torrents", "Torrents tracked for completion.")
+QUEUED_REQUESTS = Gauge("booksailor_queued_requests", "Requests waiting for a browser slot.")
+BACKEND_READY = Gauge("booksailor_backend_ready", "1 when the last health check of a backend passed.", ["backend"])
+
+
+def start_metrics_server(port: str | None = METRICS_PORT) -> bool:
+    if not port or port == "0":
+        logger.info("Metrics endpoint disabled.")
+        return False
+
+    start_http_server(int(port))
+    logger.info(f"Metrics available on :{port}/metrics")
+    return True
@@ -0,0 +1,138 @@
+from urllib.parse import urlparse
+
+import asyncio
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+import rpa as r
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ABB_MIRRORS = [
+    mirror.strip().rstrip("/")
+    for mirror in os.getenv("ABB_MIRRORS", "https://audiobookbay.lu").split(",")
+    if mirror.strip()
+]
+# "first" races the fastest healthy mirrors and keeps the first good answer,
+# "merge" asks every healthy mirror and de-duplicates the combined results.
+MIRROR_STRATEGY = os.getenv("MIRROR_STRATEGY", "first").strip().lower()
+MIRROR_RACE_WIDTH = int(os.getenv("MIRROR_RACE_WIDTH", "2"))
+LATENCY_SMOOTHING = 0.3
+MAX_BACKOFF_SECONDS = 300
+
+
+def _domain(url: str) -> str:
+    return urlparse(url).netloc.lower().removeprefix("www.")
+
+
+class MirrorPool:
+    def __init__(self, mirrors: list[str] = ABB_MIRRORS, strategy: str = MIRROR_STRATEGY,
+                 race_width: int = MIRROR_RACE_WIDTH):
+        self.mirrors = list(mirrors)
+        self.strategy = strategy
+        self.race_width = max(1, race_width)
+        self.latency: dict[str, float | None] = {mirror: None for mirror in self.mirrors}
+        self._failures: dict[str, int] = {mirror: 0 for mirror in self.mirrors}
+        self._down_until: dict[str, float] = {}
+        # Race losers still running; held so they finish and get recorded.
+        self._stragglers: set[asyncio.Task] = set()
+
+    @property
+    def primary(self) -> str:
+        return self.ranked()[0]
+
+    def domains(self) -> list[str]:
+        return [_domain(mirror) for mirror in self.mirrors]
+
+    def mirror_for(self, url: str) -> str | None:
+        domain = _domain(url)
+        for mirror in self.mirrors:
+            if _domain(mirror) == domain:
+                return mirror
+        return None
+
+    def healthy(self, mirror: str) -> bool:
+        return self._down_until.get(mirror, 0) <= time.monotonic()
+
+    def ranked(self) -> list[str]:
+        # Healthy mirrors first, fastest first; never-measured mirrors get a
+        # chance ahead of slow ones.
+        return sorted(self.mirrors, key=lambda mirror: (not self.healthy(mirror), self.latency[mirror] or 0.0))
+
+    def record(self, mirror: str, seconds: float, ok: bool):
+        if ok:
+            previous = self.latency[mirror]
+            self.latency[mirror] = seconds if previous is None else (
+                LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * previous
+            )
+            self._failures[mirror] = 0
+            self._down_until.pop(mirror, None)
+            return
+
+        self._failures[mirror] += 1
+        backoff = min(MAX_BACKOFF_SECONDS, 30 * 2 ** (self._failures[mirror] - 1))
+        self._down_until[mirror] = time.monotonic() + backoff
+        logger.warning(f"Mirror {mirror} failed, skipping it for {backoff}s")
+
+    async def _timed_search(self, rpa: r.WebsiteNavigationRPA, query: str, page: int):
+        started = time.monotonic()
+        try:
+            results = await rpa.search_posts_async(query, page)
+        except (r.BrowserlessBusyError, r.CircuitOpenError):
+            raise
+        except Exception as e:
+            self.record(rpa.base_url, time.monotonic() - started, ok=False)
+            logger.error(f"Search on {rpa.base_url} failed: {e}")
+            return None
+        self.record(rpa.base_url, time.monotonic() - started, ok=True)
+        return results
+
+    def _let_finish(self, task: asyncio.Task):
+        # Cancelling a search only abandons the await, its executor thread keeps
+        # going. Leaving it to finish costs nothing more and records how the
+        # mirror really did, so a hanging mirror still ends up backed off.
+        def done(finished: asyncio.Task):
+            self._stragglers.discard(finished)
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.debug(f"Losing mirror search failed: {finished.exception()}")
+
+        self._stragglers.add(task)
+        task.add_done_callback(done)
+
+    async def search_page(self, rpa_for, query: str, page: int = 1) -> list[tuple[str, str]]:
+        mirrors = [mirror for mirror in self.ranked() if self.healthy(mirror)] or self.ranked()
+
+        if self.strategy == "merge":
+            pages = await asyncio.gather(*(self._timed_search(rpa_for(mirror), query, page) for mirror in mirrors))
+            return [result for results in pages if results for result in results]
+
+        # Race a few at a time; the first mirror with results wins and the rest finish unawaited.
+        answered = False
+        for start in range(0, len(mirrors), self.race_width):
+            tasks = [
+                asyncio.ensure_future(self._timed_search(rpa_for(mirror), query, page))
+                for mirror in mirrors[start:start + self.race_width]
+            ]
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    results = await next_result
+                    if results:
+                        return results
+                    answered = answered or results is not None
+            finally:
+                for task in tasks:
+                    self._let_finish(task)
+
+            # A mirror answered without results, so this is a genuine miss.
+            if answered:
+                return []
+        return []
+
+    async def iter_search_results(self, rpa_for, query: str, pages: int = 1):
+        async for batch in r.iter_result_pages(lambda page: self.search_page(rpa_for, query, page), pages):
+            yield batch
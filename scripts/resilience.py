@@ -0,0 +1,113 @@
+from collections import deque
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class LatencyTracker:
+    # Timeouts follow what the backend actually does: a multiple of the
+    # observed p95, clamped so a cold start or a bad spell can't run away.
+    def __init__(self, default_timeout: float, min_timeout: float, max_timeout: float,
+                 percentile: float = 0.95, multiplier: float = 3.0, window: int = 100, min_samples: int = 5):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+    def timeout(self) -> float:
+        if len(self._samples) < self.min_samples:
+            return self.default_timeout
+        return max(self.min_timeout, min(self.max_timeout, self.quantile(self.percentile) * self.multiplier))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30, probe=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        logger.warning(f"{self.name} circuit opened for {self.reset_timeout}s after {self.failures} failures")
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"{self.name} is unavailable, failing fast")
+            # Exactly one caller gets to probe; everyone else keeps failing fast.
+            self.state = self.HALF_OPEN
+
+        if self.probe is None:
+            return
+
+        try:
+            healthy = bool(self.probe())
+        except Exception as e:
+            logger.warning(f"{self.name} half-open probe failed: {e}")
+            healthy = False
+
+        if not healthy:
+            with self._lock:
+                self._open()
+            raise CircuitOpenError(f"{self.name} is still unavailable")
+
+        self.record_success()
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open()
+
+    def call(self, func, *args, **kwargs):
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
@@ -1,11 +1,27 @@
-from urllib.parse import urlencode, urljoin
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlencode, urljoin, urlparse
 
+import asyncio
 import json
 import logging
 import os
-from typing import Any
+import threading
+import time
+from typing import TYPE_CHECKING, Any
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from cache import link_cache, normalize_query, search_cache
+from catalog import catalog
+import metrics
+from direct import DIRECT_HTTP_ENABLED, DirectHttpClient, FallbackRequired, search_url
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker
+from scheduler import BROWSER_MAX_CONCURRENCY
+
+if TYPE_CHECKING:
+    from browser_pool import BrowserPool
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +30,102 @@ DEFAULT_USER_AGENT = (
     "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 )
 
+# Actions that run with request interception aborting everything the scrapers
+# don't need. The login form is left alone by default.
+LEAN_ACTIONS = tuple(
+    action.strip()
+    for action in os.getenv("BROWSERLESS_LEAN_ACTIONS", "search,post_info,download").split(",")
+    if action.strip()
+)
+LEAN_BLOCKED_RESOURCE_TYPES = ["image", "media", "font", "stylesheet", "texttrack", "eventsource", "websocket", "manifest"]
+LEAN_BLOCKED_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "popads.net",
+    "popcash.net",
+    "propellerads.com",
+    "exoclick.com",
+    "juicyads.com",
+    "onclickads.net",
+    "mgid.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "facebook.net",
+    "disqus.com",
+]
+
+BROWSERLESS_TIMEOUT = float(os.getenv("BROWSERLESS_TIMEOUT", "90"))
+BROWSERLESS_MIN_TIMEOUT = float(os.getenv("BROWSERLESS_MIN_TIMEOUT", "15"))
+BROWSERLESS_PROBE_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+BROWSERLESS_MAX_WORKERS = int(os.getenv("BROWSERLESS_MAX_WORKERS", "4"))
+# Statuses meaning "no /function here, or not in this payload mode"; only
+# these and connection errors move on to the next candidate endpoint.
+ENDPOINT_MISSING_STATUSES = {404, 405, 415}
+# A failed login is not retried by the standalone login step for this long.
+LOGIN_RETRY_SECONDS = float(os.getenv("LOGIN_RETRY_SECONDS", "600"))
+
+# "function" posts a self-contained script to /function for every action,
+# "cdp" runs actions on warm, logged-in contexts over one persistent connection.
+BROWSERLESS_MODE = os.getenv("BROWSERLESS_MODE", "function").strip().lower()
+BROWSERLESS_POOL_SIZE = int(os.getenv("BROWSERLESS_POOL_SIZE", "2"))
+BROWSERLESS_CONTEXT_MAX_USES = int(os.getenv("BROWSERLESS_CONTEXT_MAX_USES", "50"))
+
+# Shared across every RPA instance so Browserless calls reuse pooled connections
+# and never run on the Discord event loop.
+_executor = ThreadPoolExecutor(max_workers=BROWSERLESS_MAX_WORKERS, thread_name_prefix="browserless")
+# Browser sessions open at once, process-wide. The scheduler admits whole
+# requests, but a request can fan out over result pages, mirrors or a bulk
+# batch, so the cap on sessions is enforced here, per call.
+_sessions = threading.BoundedSemaphore(BROWSER_MAX_CONCURRENCY)
+_http = requests.Session()
+_http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=BROWSERLESS_MAX_WORKERS))
+_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=BROWSERLESS_MAX_WORKERS))
+
+
+class BrowserlessBusyError(RuntimeError):
+    pass
+
+
+class PageError(RuntimeError):
+    # The site failed inside a working browser session: a dead mirror, a
+    # missing element. Not a Browserless failure.
+    pass
+
+
+async def iter_result_pages(fetch_page, pages: int):
+    # Fetch every result page concurrently and yield each page's new posts as
+    # soon as it arrives. The same post has the same path on every mirror, and
+    # a title already seen on another mirror is treated as a duplicate too.
+    tasks = [asyncio.ensure_future(fetch_page(page)) for page in range(1, pages + 1)]
+    seen_paths = set()
+    seen_titles = {}
+    try:
+        for next_page in asyncio.as_completed(tasks):
+            batch = []
+            for title, url in await next_page:
+                parsed = urlparse(url)
+                path = parsed.path.rstrip("/")
+                title_key = normalize_query(title)
+                if path in seen_paths or seen_titles.setdefault(title_key, parsed.netloc) != parsed.netloc:
+                    continue
+                seen_paths.add(path)
+                batch.append((title, url))
+            if batch:
+                yield batch
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
 class _BrowserlessDriverShim:
     def __init__(self, rpa: "WebsiteNavigationRPA"):
@@ -30,16 +142,32 @@ class _BrowserlessDriverShim:
 
 
 class WebsiteNavigationRPA:
-    def __init__(self, base_url, username=None, password=None, download_dir=None):
+    # AudiobookBay cookies keyed by (base_url, username), shared by every instance
+    # so a single login is reused across Browserless calls.
+    _session_cookies: dict[tuple[str, str | None], list[dict]] = {}
+    _session_lock = threading.Lock()
+    # When the last standalone login failed, per session key.
+    _login_failed_at: dict[tuple[str, str | None], float] = {}
+
+    # First (url, payload mode) pair that worked, reused process-wide and only
+    # re-probed after it fails.
+    _preferred_endpoint: tuple[str, str] | None = None
+    endpoint_stats = {"cached_hits": 0, "probes": 0, "fallbacks": 0, "failures": 0}
+    # Observed call latency per action, used to derive timeouts.
+    _latency: dict[str, LatencyTracker] = {}
+    # Warm contexts for the "cdp" mode, opened on first use.
+    _browser_pool: "BrowserPool | None" = None
+
+    def __init__(self, base_url, username=None, password=None, lean_actions=LEAN_ACTIONS):
         self.base_url = base_url.rstrip("/")
+        self.lean_actions = set(lean_actions)
         self.username = username
         self.password = password
         self.title = None
         self.author = None
-        self.files_downloaded = False
         self.magnet_link = None
+        self.torrent_url = None
         self.current_url = None
-        self.download_dir = os.path.abspath(download_dir) if download_dir else None
         self.browserless_token = os.getenv("BROWSERLESS_TOKEN")
         self.browserless_base_url = (
             os.getenv("BROWSERLESS_URL")
@@ -48,8 +176,28 @@ class WebsiteNavigationRPA:
         ).rstrip("/")
         self.driver = _BrowserlessDriverShim(self)
 
-        if self.download_dir:
-            os.makedirs(self.download_dir, exist_ok=True)
+    def _direct(self, action: str, *args) -> Any:
+        # Server rendered pages are fetched over plain HTTP first; None means
+        # the caller should fall back to Browserless.
+        if not DIRECT_HTTP_ENABLED:
+            return None
+
+        client = DirectHttpClient(self.base_url, DEFAULT_USER_AGENT, cookies=self.session_cookies)
+        try:
+            with metrics.DIRECT_HTTP_SECONDS.labels(action=action).time():
+                return getattr(client, action)(*args)
+        except FallbackRequired as e:
+            logger.info(f"Direct {action} needs the browser: {e}")
+            metrics.FAILURES.labels(backend="direct_http_fallback").inc()
+        except (requests.ConnectionError, requests.Timeout):
+            # The site itself is down; a browser would only wait on it too, and
+            # the mirror pool needs to see the failure to back the mirror off.
+            metrics.FAILURES.labels(backend="direct_http").inc()
+            raise
+        except requests.RequestException as e:
+            logger.warning(f"Direct {action} failed, falling back to Browserless: {e}")
+            metrics.FAILURES.labels(backend="direct_http").inc()
+        return None
 
     def _function_urls(self) -> list[str]:
         explicit = os.getenv("BROWSERLESS_FUNCTION_URL")
@@ -65,53 +213,236 @@ class WebsiteNavigationRPA:
             urls.append(url)
         return urls
 
-    def _execute_browserless(self, script: str) -> Any:
-        errors = []
-        headers = {
-            "Content-Type": "application/javascript",
-            "Cache-Control": "no-cache",
-        }
+    def _candidate_endpoints(self) -> list[tuple[str, str]]:
+        candidates = [(url, mode) for url in self._function_urls() for mode in ("raw", "json")]
+        preferred = self._preferred_endpoint
+        if preferred in candidates:
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+        return candidates
+
+    def _post_script(self, url: str, payload_mode: str, script: str, timeout: float = BROWSERLESS_TIMEOUT) -> Any:
+        if payload_mode == "raw":
+            headers = {
+                "Content-Type": "application/javascript",
+                "Cache-Control": "no-cache",
+            }
+            response = _http.post(url, data=script, headers=headers, timeout=timeout)
+        else:
+            response = _http.post(url, json={"code": script}, timeout=timeout)
+
+        if response.status_code == 429:
+            raise BrowserlessBusyError("Browserless is at its concurrent session limit")
+        response.raise_for_status()
+
+        if not response.text.strip():
+            return {}
 
-        for url in self._function_urls():
-            for payload_mode in ("raw", "json"):
-                try:
-                    if payload_mode == "raw":
-                        response = requests.post(url, data=script, headers=headers, timeout=90)
-                    else:
-                        response = requests.post(url, json={"code": script}, timeout=90)
+        try:
+            return response.json()
+        except ValueError:
+            return {"value": response.text}
 
-                    response.raise_for_status()
+    @classmethod
+    def _latency_for(cls, action: str) -> LatencyTracker:
+        with cls._session_lock:
+            if action not in cls._latency:
+                cls._latency[action] = LatencyTracker(default_timeout=BROWSERLESS_TIMEOUT,
+                                                      min_timeout=BROWSERLESS_MIN_TIMEOUT,
+                                                      max_timeout=BROWSERLESS_TIMEOUT)
+            return cls._latency[action]
+
+    def _ws_url(self) -> str:
+        explicit = os.getenv("BROWSERLESS_WS_URL")
+        if explicit:
+            return explicit
+
+        parsed = urlparse(self.browserless_base_url)
+        url = parsed._replace(scheme="wss" if parsed.scheme == "https" else "ws").geturl()
+        if self.browserless_token:
+            url = f"{url}?{urlencode({'token': self.browserless_token})}"
+        return url
+
+    def _warm_pool(self) -> "BrowserPool":
+        with self._session_lock:
+            if WebsiteNavigationRPA._browser_pool is None:
+                # Playwright is only needed, and only imported, in the cdp mode.
+                from browser_pool import BrowserPool
+
+                WebsiteNavigationRPA._browser_pool = BrowserPool(self._ws_url(), size=BROWSERLESS_POOL_SIZE,
+                                                                 max_uses=BROWSERLESS_CONTEXT_MAX_USES)
+            return WebsiteNavigationRPA._browser_pool
+
+    def _run_warm(self, payload: dict, action: str) -> Any:
+        latency = self._latency_for(action)
+        started = time.monotonic()
+        result = self._warm_pool().run(payload, timeout=latency.timeout())
+        latency.observe(time.monotonic() - started)
+        return result
+
+    def _run_action(self, action: str, **kwargs) -> Any:
+        payload = self._build_payload(action, **kwargs)
+        label = "+".join(payload["steps"]) if action == "pipeline" else action
+        if BROWSERLESS_MODE == "cdp":
+            return self._guarded(label, self._run_warm, payload, label)
+        return self._execute_browserless(self._script_for(payload), action=label)
+
+    def prewarm(self):
+        # Opens and logs in every warm context ahead of the first request.
+        if BROWSERLESS_MODE != "cdp":
+            return
+        try:
+            for result in self._warm_pool().prewarm(self._build_payload("login"), timeout=BROWSERLESS_TIMEOUT):
+                self._remember_session(result)
+            logger.info(f"Warmed {BROWSERLESS_POOL_SIZE} browser contexts")
+        except Exception as e:
+            logger.warning(f"Could not warm browser contexts, they will open on first use. {e}")
 
-                    if not response.text.strip():
-                        return {}
+    def _execute_browserless(self, script: str, action: str = "function") -> Any:
+        return self._guarded(action, self._execute_browserless_unguarded, script, action)
 
-                    try:
-                        return response.json()
-                    except ValueError:
-                        return {"value": response.text}
+    @staticmethod
+    def _guarded(action: str, func, *args) -> Any:
+        browserless_breaker.before_call()
+        if not _sessions.acquire(timeout=BROWSERLESS_TIMEOUT):
+            metrics.FAILURES.labels(backend="browserless_busy").inc()
+            raise BrowserlessBusyError("No Browserless session came free in time")
+        try:
+            with metrics.BROWSERLESS_ACTION_SECONDS.labels(action=action).time():
+                result = func(*args)
+        except BrowserlessBusyError:
+            # A full Browserless is busy, not broken.
+            metrics.FAILURES.labels(backend="browserless_busy").inc()
+            raise
+        except (requests.Timeout, TimeoutError):
+            # Slower than usual is not down; the timeouts follow the tail latency.
+            metrics.FAILURES.labels(backend="browserless_timeout").inc()
+            raise
+        except Exception:
+            metrics.FAILURES.labels(backend="browserless").inc()
+            browserless_breaker.record_failure()
+            raise
+        finally:
+            _sessions.release()
+        browserless_breaker.record_success()
 
-                except requests.RequestException as exc:
-                    errors.append(f"{payload_mode} {url}: {exc}")
+        if isinstance(result, dict) and result.get("error"):
+            metrics.FAILURES.labels(backend="site").inc()
+            raise PageError(f"{action} failed on {result.get('current_url') or 'the page'}: {result['error']}")
+        return result
 
+    def _execute_browserless_unguarded(self, script: str, action: str = "function") -> Any:
+        errors = []
+        preferred = self._preferred_endpoint
+        latency = self._latency_for(action)
+        # Every endpoint attempt shares one budget, so a dead Browserless costs
+        # at most BROWSERLESS_TIMEOUT instead of that much per combination.
+        deadline = time.monotonic() + BROWSERLESS_TIMEOUT
+
+        for url, payload_mode in self._candidate_endpoints():
+            timeout = min(latency.timeout(), deadline - time.monotonic())
+            if timeout <= 0:
+                errors.append("time budget exhausted")
+                break
+
+            # A timeout or an error status means the script may have run, so
+            # posting it again elsewhere would only double the load.
+            started = time.monotonic()
+            try:
+                result = self._post_script(url, payload_mode, script, timeout=timeout)
+            except requests.HTTPError as exc:
+                if exc.response is None or exc.response.status_code not in ENDPOINT_MISSING_STATUSES:
+                    WebsiteNavigationRPA.endpoint_stats["failures"] += 1
+                    raise
+                errors.append(f"{payload_mode} {url}: {exc}")
+                continue
+            except requests.ConnectionError as exc:
+                errors.append(f"{payload_mode} {url}: {exc}")
+                continue
+            except requests.RequestException:
+                WebsiteNavigationRPA.endpoint_stats["failures"] += 1
+                raise
+            latency.observe(time.monotonic() - started)
+
+            if (url, payload_mode) == preferred:
+                WebsiteNavigationRPA.endpoint_stats["cached_hits"] += 1
+            else:
+                if preferred is None:
+                    WebsiteNavigationRPA.endpoint_stats["probes"] += 1
+                else:
+                    WebsiteNavigationRPA.endpoint_stats["fallbacks"] += 1
+                    metrics.ENDPOINT_FALLBACKS.inc()
+                    logger.warning(f"Browserless endpoint fell back to {payload_mode} {url}")
+                WebsiteNavigationRPA._preferred_endpoint = (url, payload_mode)
+            return result
+
+        WebsiteNavigationRPA.endpoint_stats["failures"] += 1
         raise RuntimeError("Browserless request failed: " + " | ".join(errors))
 
     @classmethod
-    def verify_browserless_connection(cls) -> tuple[bool, str]:
-        probe = cls(base_url="https://example.com")
-        script = """
-module.exports = async ({ page }) => {
-  await page.goto('https://example.com', { waitUntil: 'domcontentloaded' });
-  return { ok: true, title: await page.title() };
-};
-""".strip()
-        try:
-            result = probe._execute_browserless(script)
-            title = result.get("title", "unknown")
-            return True, f"Browserless reachable (page title: {title})"
-        except Exception as exc:
-            return False, str(exc)
+    def endpoint_metrics(cls) -> dict[str, Any]:
+        return {**cls.endpoint_stats, "preferred_endpoint": cls._preferred_endpoint}
 
-    def _build_script(self, action: str, **kwargs) -> str:
+    @classmethod
+    def probe_browserless(cls, timeout: float = BROWSERLESS_PROBE_TIMEOUT) -> tuple[bool, str]:
+        # Metadata endpoints only, so no browser is launched. Older builds
+        # without /json/version still answer /pressure.
+        probe = cls(base_url="https://example.com")
+        params = {"token": probe.browserless_token} if probe.browserless_token else None
+        errors = []
+        for path in ("/json/version", "/pressure"):
+            url = f"{probe.browserless_base_url}{path}"
+            try:
+                response = _http.get(url, params=params, timeout=timeout)
+                response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                return False, f"Browserless unreachable at {probe.browserless_base_url}: {exc}"
+            except requests.RequestException as exc:
+                errors.append(f"{path}: {exc}")
+                continue
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if path == "/json/version":
+                return True, f"Browserless reachable at {probe.browserless_base_url} ({body.get('Browser', 'unknown browser')})"
+            pressure = body.get("pressure", {})
+            busy = "" if pressure.get("isAvailable", True) else ", at its session limit"
+            return True, f"Browserless reachable at {probe.browserless_base_url}{busy}"
+
+        return False, "Browserless did not answer: " + " | ".join(errors)
+
+    async def _run_async(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+    def _session_key(self) -> tuple[str, str | None]:
+        return self.base_url, self.username
+
+    @property
+    def session_cookies(self) -> list[dict] | None:
+        with self._session_lock:
+            return self._session_cookies.get(self._session_key())
+
+    def invalidate_session(self):
+        with self._session_lock:
+            self._session_cookies.pop(self._session_key(), None)
+
+    def _remember_session(self, result: dict):
+        if result.get("session_expired"):
+            metrics.LOGIN_RETRIES.inc()
+
+        cookies = result.get("cookies")
+        if cookies:
+            with self._session_lock:
+                self._session_cookies[self._session_key()] = cookies
+            logger.info(f"Cached AudiobookBay session for {self.username}")
+        elif result.get("session_expired"):
+            logger.info("Cached AudiobookBay session expired and re-login failed, clearing it.")
+            self.invalidate_session()
+
+    def _build_payload(self, action: str, **kwargs) -> dict:
         payload = {
             "action": action,
             "base_url": self.base_url,
@@ -119,47 +450,130 @@ module.exports = async ({ page }) => {
             "username": self.username,
             "password": self.password,
             "user_agent": DEFAULT_USER_AGENT,
+            "cookies": self.session_cookies or [],
+            "blocked_resource_types": LEAN_BLOCKED_RESOURCE_TYPES,
+            "blocked_domains": LEAN_BLOCKED_DOMAINS,
             **kwargs,
         }
+        steps = [*(payload.get("steps") or [action]), "login"]
+        payload["lean_steps"] = sorted({step for step in steps if step in self.lean_actions})
+        return payload
+
+    def _build_script(self, action: str, **kwargs) -> str:
+        return self._script_for(self._build_payload(action, **kwargs))
+
+    @staticmethod
+    def _script_for(payload: dict) -> str:
         payload_json = json.dumps(payload)
         return f"""
 module.exports = async ({{ page }}) => {{
   const payload = {payload_json};
-
-  const maybeLogin = async () => {{
-    if (!payload.username || !payload.password) {{
+  const hasCredentials = Boolean(payload.username && payload.password);
+  let loggedIn = false;
+  let sessionExpired = false;
+
+  // Lean mode aborts images, media, fonts, stylesheets and ad/tracker hosts.
+  // It is toggled per step, so a pipeline can mix lean and full steps.
+  let leanMode = false;
+  const blockedTypes = new Set(payload.blocked_resource_types);
+  const isBlocked = (request) => {{
+    if (!leanMode) {{
+      return false;
+    }}
+    if (blockedTypes.has(request.resourceType())) {{
+      return true;
+    }}
+    try {{
+      const host = new URL(request.url()).hostname;
+      return payload.blocked_domains.some((domain) => host === domain || host.endsWith(`.${{domain}}`));
+    }} catch (err) {{
       return false;
     }}
+  }};
 
-    await page.goto(payload.login_url, {{ waitUntil: 'domcontentloaded' }});
-    const usernameField = await page.$('input.login-input[name="username"]');
-    if (!usernameField) {{
+  const maybeLogin = async () => {{
+    if (!hasCredentials) {{
       return false;
     }}
 
-    await page.type('input.login-input[name="username"]', payload.username, {{ delay: 30 }});
-    await page.type('input.login-input[type="password"]', payload.password, {{ delay: 30 }});
-    await Promise.all([
-      page.click('.login-button'),
-      page.waitForNavigation({{ waitUntil: 'domcontentloaded', timeout: 10000 }}).catch(() => null),
-    ]);
+    // Logging in follows the login action's mode, whichever step triggered it.
+    const previousLeanMode = leanMode;
+    leanMode = payload.lean_steps.includes('login');
+    try {{
+      await page.goto(payload.login_url, {{ waitUntil: 'domcontentloaded' }});
+      const usernameField = await page.$('input.login-input[name="username"]');
+      if (!usernameField) {{
+        return false;
+      }}
 
-    return page.url().includes('/member/users/');
+      await page.type('input.login-input[name="username"]', payload.username, {{ delay: 30 }});
+      await page.type('input.login-input[type="password"]', payload.password, {{ delay: 30 }});
+      await Promise.all([
+        page.click('.login-button'),
+        page.waitForNavigation({{ waitUntil: 'domcontentloaded', timeout: 10000 }}).catch(() => null),
+      ]);
+
+      loggedIn = page.url().includes('/member/users/');
+      return loggedIn;
+    }} finally {{
+      leanMode = previousLeanMode;
+    }}
   }};
 
-  await page.setUserAgent(payload.user_agent);
-  await page.setViewport({{ width: 1440, height: 1024 }});
+  const looksLoggedOut = async () => {{
+    const logoutLink = await page.$('a[href*="logout"]');
+    const loginLink = await page.$('a[href*="/member/login.php"]');
+    return !logoutLink && Boolean(loginLink);
+  }};
 
-  switch (payload.action) {{
-    case 'login': {{
-      const loggedIn = await maybeLogin();
-      return {{ logged_in: loggedIn, current_url: page.url() }};
+  // Reuse the cached session cookies when we have them and only log in again
+  // if the target page comes back logged out.
+  let sessionReady = false;
+  const ensureSession = async () => {{
+    if (sessionReady) {{
+      return;
     }}
+    sessionReady = true;
 
-    case 'search': {{
+    if (payload.cookies.length) {{
+      await page.setCookie(...payload.cookies);
+    }} else {{
       await maybeLogin();
-      const searchUrl = `${{payload.base_url}}/?s=${{encodeURIComponent(payload.query)}}`;
-      await page.goto(searchUrl, {{ waitUntil: 'domcontentloaded' }});
+    }}
+  }};
+
+  const openPage = async (url) => {{
+    await ensureSession();
+
+    // Pipeline steps share one page, so skip navigating to where we already are.
+    if (page.url() === url) {{
+      return;
+    }}
+
+    await page.goto(url, {{ waitUntil: 'domcontentloaded' }});
+
+    if (hasCredentials && payload.cookies.length && !loggedIn && await looksLoggedOut()) {{
+      sessionExpired = true;
+      if (await maybeLogin()) {{
+        await page.goto(url, {{ waitUntil: 'domcontentloaded' }});
+      }}
+    }}
+  }};
+
+  const sessionState = async () => ({{
+    logged_in: loggedIn,
+    session_expired: sessionExpired,
+    cookies: loggedIn ? await page.cookies() : null,
+  }});
+
+  const steps = {{
+    login: async () => {{
+      await ensureSession();
+      return {{ current_url: page.url() }};
+    }},
+
+    search: async () => {{
+      await openPage(payload.search_url);
       await page.waitForSelector('div.post', {{ timeout: 10000 }}).catch(() => null);
       const results = await page.$$eval('div.post', (posts) =>
         posts.map((post) => {{
@@ -168,23 +582,21 @@ module.exports = async ({{ page }}) => {{
         }}).filter(Boolean)
       );
       return {{ results, current_url: page.url() }};
-    }}
+    }},
 
-    case 'post_info': {{
-      await maybeLogin();
-      await page.goto(payload.url, {{ waitUntil: 'domcontentloaded' }});
-      await page.waitForSelector('h1[itemprop="name"]', {{ timeout: 10000 }});
+    post_info: async () => {{
+      await openPage(payload.url);
+      await page.waitForSelector('h1[itemprop="name"]', {{ timeout: 10000 }}).catch(() => null);
       const info = await page.evaluate(() => {{
         const title = document.querySelector('h1[itemprop="name"]')?.textContent?.trim() ?? null;
         const author = document.querySelector('span.author')?.textContent?.trim() ?? null;
         return {{ title, author }};
       }});
       return {{ ...info, current_url: page.url() }};
-    }}
+    }},
 
-    case 'download': {{
-      await maybeLogin();
-      await page.goto(payload.url, {{ waitUntil: 'domcontentloaded' }});
+    download: async () => {{
+      await openPage(payload.url);
 
       let magnetLink = null;
       const magnetButton = await page.$('[id*="magnetLink"]');
@@ -207,10 +619,41 @@ module.exports = async ({{ page }}) => {{
         torrent_url: torrentUrl,
         current_url: page.url(),
       }};
+    }},
+  }};
+
+  const runStep = async (name) => {{
+    if (!steps[name]) {{
+      throw new Error(`Unsupported action: ${{name}}`);
     }}
+    leanMode = payload.lean_steps.includes(name);
+    return steps[name]();
+  }};
 
-    default:
-      throw new Error(`Unsupported action: ${{payload.action}}`);
+  await page.setUserAgent(payload.user_agent);
+  await page.setViewport({{ width: 1440, height: 1024 }});
+
+  if (payload.lean_steps.length) {{
+    await page.setRequestInterception(true);
+    page.on('request', (request) => {{
+      const handled = isBlocked(request) ? request.abort() : request.continue();
+      handled.catch(() => null);
+    }});
+  }}
+
+  // A failing page comes back as data, so it isn't mistaken for a Browserless failure.
+  try {{
+    if (payload.action === 'pipeline') {{
+      const merged = {{}};
+      for (const name of payload.steps) {{
+        Object.assign(merged, await runStep(name));
+      }}
+      return {{ ...merged, ...(await sessionState()) }};
+    }}
+
+    return {{ ...(await runStep(payload.action)), ...(await sessionState()) }};
+  }} catch (err) {{
+    return {{ error: String((err && err.message) || err), current_url: page.url() }};
   }}
 }};
 """.strip()
@@ -223,87 +666,226 @@ module.exports = async ({{ page }}) => {{
             logger.error(f"Error with quitting current session. {e}")
 
     def handle_login(self):
+        # Only worth a browser session when there is something to log in with
+        # and the last attempt didn't just fail.
+        if not (self.username and self.password):
+            return False
+        if self.session_cookies:
+            logger.info("Reusing cached AudiobookBay session.")
+            return True
+        with self._session_lock:
+            failed_at = self._login_failed_at.get(self._session_key())
+        if failed_at is not None and time.monotonic() - failed_at < LOGIN_RETRY_SECONDS:
+            logger.info("Last AudiobookBay login failed, not retrying it yet.")
+            return False
+
         try:
-            result = self._execute_browserless(self._build_script("login"))
+            result = self._run_action("login")
+            self._remember_session(result)
             logged_in = bool(result.get("logged_in"))
             self.current_url = result.get("current_url")
-            if logged_in:
-                logger.info("Login successful")
-            else:
-                logger.info("No login required or login could not be verified")
-            return logged_in
         except Exception as e:
             logger.error(f"Error logging into audiobook bay! {e}")
-            return False
+            logged_in = False
+
+        with self._session_lock:
+            if logged_in:
+                self._login_failed_at.pop(self._session_key(), None)
+            else:
+                self._login_failed_at[self._session_key()] = time.monotonic()
+        logger.info("Login successful" if logged_in else "Login could not be verified")
+        return logged_in
 
     def nav_login_page(self):
         self.current_url = f"{self.base_url}/member/login.php"
         logger.info("Prepared login page navigation for Browserless.")
 
-    def get_search_result_titles(self, query):
-        logger.info(f"Searching for: {query}")
+    def search_posts(self, query, page=1):
+        results = self.search_without_browser(query, page)
+        return results if results is not None else self.search_with_browser(query, page)
+
+    def search_without_browser(self, query, page=1):
+        # Cached or plain HTTP results; None when only the browser can answer.
+        cached = search_cache.get(self._search_key(query, page))
+        if cached is not None:
+            logger.info(f"Found {len(cached)} cached posts")
+            return [tuple(item) for item in cached]
+
+        results = self._direct("search", query, page)
+        return None if results is None else self._remember_results(query, page, results)
+
+    def search_with_browser(self, query, page=1):
+        url = search_url(self.base_url, query, page)
+        result = self._run_action("search", query=query, search_url=url)
+        self._remember_session(result)
+        self.current_url = result.get("current_url")
+        return self._remember_results(query, page, result.get("results", []))
+
+    def _search_key(self, query, page) -> str:
+        return f"{self.base_url}|{normalize_query(query)}|{page}"
+
+    def _remember_results(self, query, page, results: list[dict]) -> list[tuple[str, str]]:
+        logger.info(f"Found {len(results)} posts")
+        titles = [(item["title"], item["url"]) for item in results if item.get("title") and item.get("url")]
+        if titles:
+            search_cache.set(self._search_key(query, page), titles)
+            catalog.add_results(titles)
+        return titles
 
-        try:
-            result = self._execute_browserless(self._build_script("search", query=query))
-            self.current_url = result.get("current_url")
-            results = result.get("results", [])
-            logger.info(f"Found {len(results)} posts")
-            return [(item["title"], item["url"]) for item in results if item.get("title") and item.get("url")]
-        except Exception as e:
-            logger.error(f"Error during search: {e}")
-            return []
+    def process_post_by_url(self, title, url):
+        logger.info(f"Processing download for: {title}")
+        self.current_url = url
+        return self.process_download_page()
+
+    def _apply_download_result(self, result: dict):
+        self.current_url = result.get("current_url")
+        self.magnet_link = result.get("magnet_link")
+
+        if self.magnet_link:
+            logger.info(f"Successfully retrieved magnet link: {self.magnet_link}")
+            return self.magnet_link
+
+        torrent_url = result.get("torrent_url")
+        if torrent_url:
+            if not torrent_url.startswith("http"):
+                torrent_url = urljoin(self.base_url, torrent_url)
+            logger.info(f"Found torrent download URL: {torrent_url}")
+            self.torrent_url = torrent_url
+            return torrent_url
+
+        logger.error("No magnet link or torrent URL found on download page.")
+        return None
+
+    def _cache_download_result(self, post_url: str, result: dict):
+        if not (result.get("magnet_link") or result.get("torrent_url")):
+            return
+
+        cached = {
+            "magnet_link": result.get("magnet_link"),
+            "torrent_url": result.get("torrent_url"),
+            "title": result.get("title"),
+            "author": result.get("author"),
+            "current_url": result.get("current_url"),
+        }
+        link_cache.set(post_url, cached)
+        catalog.record(post_url, title=cached["title"], author=cached["author"],
+                       magnet_link=cached["magnet_link"], torrent_url=cached["torrent_url"])
+
+    def run_pipeline(self, steps: list[str], **kwargs) -> dict:
+        logger.info(f"Running Browserless pipeline: {' -> '.join(steps)}")
+        result = self._run_action("pipeline", steps=steps, **kwargs)
+        self._remember_session(result)
+        return result
+
+    def process_post_page(self):
+        self.magnet_link = None
+        self.torrent_url = None
 
-    def get_post_info(self):
         if not self.current_url:
-            logger.error("No current URL set before requesting post info.")
-            return None
+            raise ValueError("No current URL set for post processing.")
+
+        logger.info("Processing post page")
+
+        cached = link_cache.get(self.current_url)
+        if cached and cached.get("title"):
+            logger.info("Using cached post details and download link")
+            self.title = cached["title"]
+            self.author = cached.get("author")
+            return self._apply_download_result(cached)
 
         try:
-            result = self._execute_browserless(self._build_script("post_info", url=self.current_url))
-            self.current_url = result.get("current_url")
+            post_url = self.current_url
+            result = self.run_pipeline(["login", "post_info", "download"], url=post_url)
             self.title = result.get("title")
             self.author = result.get("author")
-            return self.title, self.author
-        except Exception as e:
-            logger.error(f"Could not find title or author due to an error... {e}")
-            return None
+            outcome = self._apply_download_result(result)
+            self._cache_download_result(post_url, result)
+            return outcome
 
-    def process_post_by_url(self, title, url):
-        logger.info(f"Processing download for: {title}")
-        self.current_url = url
-        return self.process_download_page()
+        except Exception as e:
+            logger.error(f"Error on post page: {e}")
+            raise
 
     def process_download_page(self):
-        self.files_downloaded = False
         self.magnet_link = None
+        self.torrent_url = None
 
         if not self.current_url:
             raise ValueError("No current URL set for download processing.")
 
         logger.info("Processing download page")
 
+        cached = link_cache.get(self.current_url)
+        if cached:
+            logger.info("Using cached download link")
+            return self._apply_download_result(cached)
+
         try:
-            result = self._execute_browserless(self._build_script("download", url=self.current_url))
-            self.current_url = result.get("current_url")
-            self.magnet_link = result.get("magnet_link")
+            post_url = self.current_url
+            result = self._run_action("download", url=post_url)
+            self._remember_session(result)
+            outcome = self._apply_download_result(result)
+            self._cache_download_result(post_url, result)
+            return outcome
 
-            if self.magnet_link:
-                logger.info(f"Successfully retrieved magnet link: {self.magnet_link}")
-                return self.magnet_link
+        except Exception as e:
+            logger.error(f"Error on download page: {e}")
+            raise
 
-            torrent_url = result.get("torrent_url")
-            if torrent_url:
-                if not torrent_url.startswith("http"):
-                    torrent_url = urljoin(self.base_url, torrent_url)
-                logger.info(f"Found torrent download URL: {torrent_url}")
-                return torrent_url
+    def fetch_torrent(self) -> bytes | None:
+        # The .torrent is read straight into memory and handed to Transmission
+        # as metainfo, so nothing touches the disk.
+        if not self.torrent_url:
+            return None
 
-            logger.error("No magnet link or torrent URL found on download page.")
+        client = DirectHttpClient(self.base_url, DEFAULT_USER_AGENT, cookies=self.session_cookies)
+        try:
+            with metrics.DIRECT_HTTP_SECONDS.labels(action="torrent").time():
+                return client.torrent(self.torrent_url)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Could not fetch torrent file {self.torrent_url}: {e}")
+            metrics.FAILURES.labels(backend="direct_http").inc()
             return None
 
-        except Exception as e:
-            logger.error(f"Error on download page: {e}")
-            raise
+    # Async wrappers ----------------
+    # Each call runs on the bounded Browserless executor so several searches and
+    # downloads can be in flight while the Discord gateway stays responsive.
+
+    async def handle_login_async(self):
+        return await self._run_async(self.handle_login)
+
+    async def search_posts_async(self, query, page=1):
+        # The plain HTTP attempt stays off the Browserless executor, whose
+        # workers may all be waiting for a browser session.
+        results = await asyncio.to_thread(self.search_without_browser, query, page)
+        if results is not None:
+            return results
+        return await self._run_async(self.search_with_browser, query, page)
+
+    async def prewarm_async(self):
+        return await self._run_async(self.prewarm)
+
+    async def process_post_by_url_async(self, title, url):
+        return await self._run_async(self.process_post_by_url, title, url)
+
+    async def process_post_page_async(self):
+        return await self._run_async(self.process_post_page)
+
+    async def process_download_page_async(self):
+        return await self._run_async(self.process_download_page)
+
+    async def fetch_torrent_async(self) -> bytes | None:
+        # Plain HTTP, so it doesn't take a Browserless worker.
+        return await asyncio.to_thread(self.fetch_torrent)
+
+
+
+browserless_breaker = CircuitBreaker(
+    "Browserless",
+    failure_threshold=int(os.getenv("BROWSERLESS_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("BROWSERLESS_BREAKER_RESET_SECONDS", "30")),
+    probe=lambda: WebsiteNavigationRPA.probe_browserless()[0],
+)
 
 
 if __name__ == "__main__":
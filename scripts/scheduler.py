@@ -0,0 +1,172 @@
+from collections import deque
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+BROWSER_MAX_CONCURRENCY = int(os.getenv("BROWSER_MAX_CONCURRENCY", "2"))
+USER_RATE_BURST = int(os.getenv("USER_RATE_BURST", "3"))
+USER_RATE_SECONDS = float(os.getenv("USER_RATE_SECONDS", "20"))
+QUEUE_POSITION_UPDATE_SECONDS = 3
+# Background work (speculative link resolution) may use at most this many
+# slots, and never the last free one.
+BACKGROUND_MAX_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Job:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.started = asyncio.get_running_loop().create_future()
+
+
+class BrowserScheduler:
+    def __init__(self, max_concurrency: int = BROWSER_MAX_CONCURRENCY, rate_burst: int = USER_RATE_BURST,
+                 rate_seconds: float = USER_RATE_SECONDS, background_concurrency: int = BACKGROUND_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.rate_burst = rate_burst
+        self.rate_seconds = rate_seconds
+        self.background_concurrency = background_concurrency
+        self.running = 0
+        self.running_background = 0
+        self._background: deque[_Job] = deque()
+        self._queues: dict[int, deque[_Job]] = {}
+        # Users with queued work, served round-robin so one user can't starve the rest.
+        self._turns: deque[int] = deque()
+        self._buckets: dict[int, tuple[float, float]] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _take_token(self, user_id):
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(user_id, (self.rate_burst, now))
+        tokens = min(self.rate_burst, tokens + (now - updated) / self.rate_seconds)
+        if tokens < 1:
+            raise RateLimited((1 - tokens) * self.rate_seconds)
+        self._buckets[user_id] = (tokens - 1, now)
+
+    def position(self, job: _Job) -> int:
+        # Walk the round-robin order the same way _dispatch will.
+        queues = {user_id: list(queue) for user_id, queue in self._queues.items()}
+        turns = list(self._turns)
+        position = 0
+        while turns:
+            user_id = turns.pop(0)
+            queue = queues[user_id]
+            position += 1
+            if queue.pop(0) is job:
+                return position
+            if queue:
+                turns.append(user_id)
+        return 0
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency and self._turns:
+            user_id = self._turns.popleft()
+            queue = self._queues[user_id]
+            job = queue.popleft()
+            if queue:
+                self._turns.append(user_id)
+            else:
+                del self._queues[user_id]
+
+            if job.started.cancelled():
+                continue
+            self.running += 1
+            job.started.set_result(None)
+
+        # Background jobs only take what users leave, and always leave one slot free.
+        while (self._background and not self._turns and self.running + 1 < self.max_concurrency
+               and self.running_background < self.background_concurrency):
+            job = self._background.popleft()
+            if job.started.cancelled():
+                continue
+            self.running += 1
+            self.running_background += 1
+            job.started.set_result(None)
+
+    def _release_background(self):
+        self.running -= 1
+        self.running_background -= 1
+        self._dispatch()
+
+    def _finish_background(self, task: asyncio.Task):
+        # Nobody may be waiting on the result any more.
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Background job failed: {task.exception()}")
+        self._release_background()
+
+    def _dequeue(self, job: _Job):
+        queue = self._queues.get(job.user_id)
+        if queue and job in queue:
+            queue.remove(job)
+            if not queue:
+                del self._queues[job.user_id]
+                self._turns.remove(job.user_id)
+
+    async def submit(self, user_id, func, *args, on_position=None, **kwargs):
+        self._take_token(user_id)
+
+        job = _Job(user_id)
+        if user_id not in self._queues:
+            self._queues[user_id] = deque()
+            self._turns.append(user_id)
+        self._queues[user_id].append(job)
+        self._dispatch()
+
+        try:
+            last_position = None
+            while not job.started.done():
+                position = self.position(job)
+                if on_position and position and position != last_position:
+                    last_position = position
+                    try:
+                        await on_position(position)
+                    except Exception as e:
+                        logger.warning(f"Could not report queue position. {e}")
+                await asyncio.wait({job.started}, timeout=QUEUE_POSITION_UPDATE_SECONDS)
+        except asyncio.CancelledError:
+            if job.started.done():
+                self.running -= 1
+                self._dispatch()
+            else:
+                self._dequeue(job)
+                job.started.cancel()
+            raise
+
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self.running -= 1
+            self._dispatch()
+
+    async def submit_background(self, func, *args, **kwargs):
+        # Low priority work with no rate limit and no queue position. Cancelling
+        # it while queued drops it; once started it runs to completion, keeping
+        # its slot until the browser call really ends, and only the caller's
+        # wait is cancelled.
+        job = _Job(None)
+        self._background.append(job)
+        self._dispatch()
+
+        try:
+            await job.started
+        except asyncio.CancelledError:
+            if job.started.done() and not job.started.cancelled():
+                self._release_background()
+            elif job in self._background:
+                self._background.remove(job)
+            raise
+
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        task.add_done_callback(self._finish_background)
+        return await asyncio.shield(task)
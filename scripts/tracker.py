@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+
+from transmission import TransmissionClient
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = {"seeding", "seed pending"}
+
+# Transmission only reports torrents active within the last 60 seconds as
+# recently-active, so the slow interval has to stay below that.
+FAST_POLL_SECONDS = float(os.getenv("TORRENT_FAST_POLL_SECONDS", "10"))
+SLOW_POLL_SECONDS = min(float(os.getenv("TORRENT_SLOW_POLL_SECONDS", "45")), 55)
+NEAR_DONE_PERCENT = 0.9
+NEAR_DONE_ETA_SECONDS = 120
+FULL_REFRESH_EVERY = 10
+
+
+class TrackedTorrent:
+    def __init__(self, torrent_id: int, name: str, user_id: int | None = None, info_hash: str | None = None):
+        self.id = torrent_id
+        self.name = name
+        self.info_hash = info_hash
+        # Everyone who asked for this torrent gets the completion notice.
+        self.user_ids = {user_id} if user_id else set()
+        self.percent_done = 0.0
+        self.eta = None
+
+    def update(self, torrent):
+        self.name = torrent.name or self.name
+        self.percent_done = torrent.percent_done
+        self.eta = torrent.fields.get("eta")
+
+    @property
+    def near_done(self) -> bool:
+        if self.percent_done >= NEAR_DONE_PERCENT:
+            return True
+        return self.eta is not None and 0 <= self.eta <= NEAR_DONE_ETA_SECONDS
+
+
+class CompletionTracker:
+    def __init__(self, transmission: TransmissionClient):
+        self.transmission = transmission
+        self._tracked: dict[int, TrackedTorrent] = {}
+        self._lock = threading.Lock()
+        self._needs_full_refresh = True
+        self._polls = 0
+
+    def __len__(self):
+        return len(self._tracked)
+
+    def __contains__(self, torrent_id):
+        return torrent_id in self._tracked
+
+    def track(self, torrent_id: int, name: str, user_id: int | None = None, info_hash: str | None = None):
+        with self._lock:
+            tracked = self._tracked.get(torrent_id)
+            if tracked is not None:
+                if user_id:
+                    tracked.user_ids.add(user_id)
+                return
+            self._tracked[torrent_id] = TrackedTorrent(torrent_id, name, user_id, info_hash)
+            self._needs_full_refresh = True
+        logger.info(f"Tracking torrent {name} ({torrent_id}) for completion.")
+
+    def restore(self, jobs) -> tuple[list[TrackedTorrent], set[str]] | None:
+        # One batched lookup by infohash for every stored job, since torrent ids
+        # don't survive a Transmission restart. Returns the torrents that finished
+        # while the bot was down and the hashes Transmission no longer has.
+        hashes = list({job["info_hash"] for job in jobs})
+        torrents = self.transmission.get_torrent_status(hashes)
+        if torrents is None:
+            return None
+
+        by_hash = {tor.hash_string: tor for tor in torrents}
+        finished: dict[int, TrackedTorrent] = {}
+        with self._lock:
+            for job in jobs:
+                tor = by_hash.get(job["info_hash"])
+                if tor is None:
+                    continue
+
+                if tor.status in FINISHED_STATUSES:
+                    tracked = finished.setdefault(tor.id, TrackedTorrent(tor.id, tor.name, info_hash=tor.hash_string))
+                else:
+                    tracked = self._tracked.setdefault(tor.id, TrackedTorrent(tor.id, tor.name,
+                                                                              info_hash=tor.hash_string))
+                    tracked.update(tor)
+                if job["user_id"]:
+                    tracked.user_ids.add(job["user_id"])
+            self._needs_full_refresh = True
+
+        logger.info(f"Restored {len(self._tracked)} tracked torrents, {len(finished)} finished while offline.")
+        return list(finished.values()), set(hashes) - set(by_hash)
+
+    def next_interval(self) -> float | None:
+        with self._lock:
+            if not self._tracked:
+                return None
+            if any(tracked.near_done for tracked in self._tracked.values()):
+                return FAST_POLL_SECONDS
+            return SLOW_POLL_SECONDS
+
+    def poll(self) -> tuple[list[TrackedTorrent], list[TrackedTorrent]] | None:
+        # Returns the torrents that finished and the ones Transmission no longer
+        # has; both stop being tracked.
+        with self._lock:
+            ids = list(self._tracked)
+            full_refresh = self._needs_full_refresh or self._polls % FULL_REFRESH_EVERY == 0
+            self._polls += 1
+
+        if not ids:
+            return [], []
+
+        if full_refresh:
+            torrents = self.transmission.get_torrent_status(ids)
+            if torrents is None:
+                return None
+            removed = set(ids) - {tor.id for tor in torrents}
+        else:
+            delta = self.transmission.get_recently_active()
+            if delta is None:
+                return None
+            torrents, removed = delta
+
+        finished, dropped = [], []
+        with self._lock:
+            self._needs_full_refresh = False
+
+            for tor in torrents:
+                tracked = self._tracked.get(tor.id)
+                if tracked is None:
+                    continue
+
+                tracked.update(tor)
+                if tor.status in FINISHED_STATUSES:
+                    logger.debug(f"Finished Torrent Found! {tracked.name}")
+                    finished.append(self._tracked.pop(tor.id))
+
+            for torrent_id in removed:
+                tracked = self._tracked.pop(torrent_id, None)
+                if tracked:
+                    logger.warning(f"Torrent {tracked.name} is no longer in Transmission.")
+                    dropped.append(tracked)
+
+        return finished, dropped
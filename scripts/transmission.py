@@ -2,44 +2,182 @@ from transmission_rpc import Client, error
 from dotenv import load_dotenv
 import logging
 import os
+import threading
+import time
+
+import metrics
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Fields needed to report on a download's progress.
+STATUS_FIELDS = ["id", "name", "hashString", "status", "percentDone", "eta"]
+
+TRANSMISSION_TIMEOUT = float(os.getenv("TRANSMISSION_TIMEOUT", "30"))
+transmission_latency = LatencyTracker(default_timeout=TRANSMISSION_TIMEOUT, min_timeout=2,
+                                      max_timeout=TRANSMISSION_TIMEOUT)
+
 
 # Transmission Client
 class TransmissionClient:
+    # One transmission_rpc.Client per process so the HTTP connection and the
+    # negotiated CSRF session id are reused by every caller.
+    _shared_client: Client | None = None
+    _lock = threading.Lock()
+
     def __init__(self):
         self.host = os.getenv('TRANSMISSION_HOST', 'localhost')
         self.port = int(os.getenv('TRANSMISSION_PORT', '9091'))
         self.username = os.getenv('TRANSMISSION_USERNAME', 'user')
         self.password = os.getenv('TRANSMISSION_PASS')
-        self.client = Client(host=self.host, port=self.port,
-                             username=self.username, password=self.password)
+
+    @property
+    def client(self) -> Client:
+        with self._lock:
+            if TransmissionClient._shared_client is None:
+                logger.info(f"Connecting to Transmission at {self.host}:{self.port}")
+                TransmissionClient._shared_client = Client(host=self.host, port=self.port,
+                                                           username=self.username, password=self.password,
+                                                           timeout=TRANSMISSION_TIMEOUT)
+            return TransmissionClient._shared_client
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._shared_client = None
+
+    def _invoke(self, method: str, *args, **kwargs):
+        # transmission_rpc refreshes the session id on a 409 by itself, so only
+        # connection level failures need a fresh client.
+        try:
+            return getattr(self.client, method)(*args, **kwargs)
+        except (error.TransmissionConnectError, error.TransmissionTimeoutError) as e:
+            logger.warning(f"Transmission connection lost, reconnecting. {e}")
+            self.reset()
+            return getattr(self.client, method)(*args, **kwargs)
+
+    def _call(self, method: str, *args, **kwargs):
+        transmission_breaker.before_call()
+        started = time.monotonic()
+        try:
+            result = self._invoke(method, *args, timeout=transmission_latency.timeout(), **kwargs)
+        except (error.TransmissionConnectError, error.TransmissionTimeoutError, error.TransmissionAuthError):
+            metrics.FAILURES.labels(backend="transmission").inc()
+            transmission_breaker.record_failure()
+            raise
+        except error.TransmissionError:
+            # The daemon answered, it just rejected the request.
+            metrics.FAILURES.labels(backend="transmission_rejected").inc()
+            transmission_breaker.record_success()
+            raise
+        elapsed = time.monotonic() - started
+        transmission_breaker.record_success()
+        transmission_latency.observe(elapsed)
+        metrics.TRANSMISSION_RPC_SECONDS.labels(method=method).observe(elapsed)
+        return result
+
+    def probe(self) -> bool:
+        self.reset()
+        return bool(self.client.get_session())
+
+    def health(self, timeout: float) -> tuple[bool, str]:
+        # A session-get with a short timeout; on success the connection is kept
+        # as the shared client.
+        try:
+            client = Client(host=self.host, port=self.port, username=self.username, password=self.password,
+                            timeout=timeout)
+        except error.TransmissionError as e:
+            return False, f"Transmission unreachable at {self.host}:{self.port}: {e}"
+
+        with self._lock:
+            TransmissionClient._shared_client = client
+        return True, f"Transmission {client.server_version} reachable at {self.host}:{self.port}"
 
     def get_torrents(self):
         try:
             logger.info("Retrieving Torrents...")
-            torrents = self.client.get_torrents()
+            torrents = self._call("get_torrents")
             return torrents
 
         except Exception as e:
             logger.error(f"Could not retrieve the list of torrents. {e}")
 
-    def load_torrent(self, file_path: str):
-        logger.info(f"Attempting to add torrent with path {file_path}")
+    def get_torrent_status(self, ids: list[int | str]):
+        if not ids:
+            return []
+
         try:
-            session = self.client.get_session()
-            if session:
-                torrent = self.client.add_torrent(torrent=file_path,
-                                                  download_dir=os.getenv('TRANSMISSION_DOWNLOAD', '/downloads'))
+            logger.info(f"Retrieving status of {len(ids)} tracked torrents...")
+            return self._call("get_torrents", ids=ids, arguments=STATUS_FIELDS)
 
-                return torrent
+        except Exception as e:
+            logger.error(f"Could not retrieve the status of tracked torrents. {e}")
 
-        except error.TransmissionError as e:
+    def find_torrent(self, info_hash: str):
+        # Transmission accepts infohashes wherever it accepts ids.
+        try:
+            torrents = self._call("get_torrents", ids=[info_hash], arguments=STATUS_FIELDS)
+        except Exception as e:
+            logger.error(f"Could not look up torrent {info_hash}. {e}")
+            return None
+        return torrents[0] if torrents else None
+
+    def get_recently_active(self):
+        try:
+            logger.debug("Retrieving recently active torrents...")
+            return self._call("get_recently_active_torrents", arguments=STATUS_FIELDS)
+
+        except Exception as e:
+            logger.error(f"Could not retrieve recently active torrents. {e}")
+
+    def load_torrent(self, file_path: str | None = None, metainfo: bytes | None = None):
+        if metainfo is not None:
+            logger.info(f"Attempting to add torrent from {len(metainfo)} bytes of metainfo")
+        else:
+            logger.info(f"Attempting to add torrent with path {file_path}")
+        try:
+            # transmission_rpc sends bytes as base64 metainfo and strings as a filename/magnet.
+            torrent = self._call("add_torrent", torrent=metainfo if metainfo is not None else file_path,
+                                 download_dir=os.getenv('TRANSMISSION_DOWNLOAD', '/downloads'))
+
+            return torrent
+
+        except (error.TransmissionError, CircuitOpenError) as e:
             logger.error(f"Failed to add torrent: {e}")
 
+    def load_torrents(self, items: list[tuple[str | None, str | None, bytes | None]]):
+        # Adds (info_hash, magnet, metainfo) items in one pass: a single lookup
+        # for the torrents Transmission already has, then one add per new torrent.
+        # Returns (torrent, already_present) per item; torrent is None on failure.
+        # A repeated infohash is added once and reported present after that, with
+        # the add result, which carries no status.
+        hashes = list({info_hash for info_hash, _, _ in items if info_hash})
+        known = {tor.hash_string: tor for tor in self.get_torrent_status(hashes) or []}
+
+        results = []
+        added = {}
+        for info_hash, magnet, metainfo in items:
+            if info_hash in known:
+                results.append((known[info_hash], True))
+            elif info_hash in added:
+                results.append((added[info_hash], added[info_hash] is not None))
+            else:
+                torrent = self.load_torrent(file_path=magnet, metainfo=metainfo)
+                if info_hash:
+                    added[info_hash] = torrent
+                results.append((torrent, False))
+        return results
+
+
+transmission_breaker = CircuitBreaker(
+    "Transmission",
+    failure_threshold=int(os.getenv("TRANSMISSION_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("TRANSMISSION_BREAKER_RESET_SECONDS", "30")),
+    probe=lambda: TransmissionClient().probe(),
+)
+
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
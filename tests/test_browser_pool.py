@@ -0,0 +1,139 @@
+from pathlib import Path
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("playwright")
+
+os.environ["CATALOG_DB_PATH"] = ""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import browser_pool  # noqa: E402
+import rpa as r  # noqa: E402
+from browser_pool import BrowserPool, PlaywrightError  # noqa: E402
+
+BASE_URL = "https://audiobookbay.test"
+
+
+# Just enough of Playwright's async API for a search on a warm page; the
+# real thing needs a Browserless to connect to.
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.url = "about:blank"
+
+    async def goto(self, url, wait_until=None):
+        if "broken" in url:
+            raise PlaywrightError("net::ERR_CONNECTION_RESET")
+        self.browser.visits.append(url)
+        self.url = url
+
+    async def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    async def query_selector(self, selector):
+        return None
+
+    async def eval_on_selector_all(self, selector, script):
+        return [{"title": "Book 1", "url": f"{BASE_URL}/abss/book-1/"}]
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage(self.browser)
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def add_cookies(self, cookies):
+        pass
+
+    async def cookies(self):
+        return []
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, ws_url):
+        self.ws_url = ws_url
+        self.contexts: list[FakeContext] = []
+        self.visits: list[str] = []
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, user_agent=None, viewport=None):
+        self.contexts.append(FakeContext(self))
+        return self.contexts[-1]
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers: list[FakeBrowser] = []
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def connect_over_cdp(self, ws_url):
+        self.browsers.append(FakeBrowser(ws_url))
+        return self.browsers[-1]
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    fake = FakePlaywright()
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: fake)
+    monkeypatch.setattr(r, "BROWSERLESS_MODE", "cdp")
+    monkeypatch.setattr(r.WebsiteNavigationRPA, "_browser_pool", None)
+    return fake
+
+
+def search_payload(url: str) -> dict:
+    return r.WebsiteNavigationRPA(BASE_URL)._build_payload("search", query="book", search_url=url)
+
+
+def test_warm_context_is_reused_across_searches(playwright):
+    pool = BrowserPool("ws://browserless:3000", size=1)
+
+    first = pool.run(search_payload(f"{BASE_URL}/?s=book"), timeout=5)
+    second = pool.run(search_payload(f"{BASE_URL}/page/2/?s=book"), timeout=5)
+
+    assert first["results"] == [{"title": "Book 1", "url": f"{BASE_URL}/abss/book-1/"}]
+    assert second["current_url"] == f"{BASE_URL}/page/2/?s=book"
+    [browser] = playwright.browsers
+    assert browser.ws_url == "ws://browserless:3000"
+    assert len(browser.contexts) == 1
+
+
+def test_page_error_is_returned_and_context_recycled(playwright):
+    pool = BrowserPool("ws://browserless:3000", size=1)
+
+    result = pool.run(search_payload(f"{BASE_URL}/broken/?s=book"), timeout=5)
+    pool.run(search_payload(f"{BASE_URL}/?s=book"), timeout=5)
+
+    assert "ERR_CONNECTION_RESET" in result["error"]
+    [browser] = playwright.browsers
+    assert [context.closed for context in browser.contexts] == [True, False]
+
+
+def test_cdp_mode_runs_actions_on_the_pool(playwright):
+    result = r.WebsiteNavigationRPA(BASE_URL)._run_action("search", query="book", search_url=f"{BASE_URL}/?s=book")
+
+    assert result["results"][0]["title"] == "Book 1"
+    [browser] = playwright.browsers
+    assert browser.visits == [f"{BASE_URL}/?s=book"]
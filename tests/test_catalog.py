@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import os
+import sys
+
+os.environ["CATALOG_DB_PATH"] = ""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from catalog import CATALOG_MIN_SCORE, Catalog, match_score, post_path  # noqa: E402
+
+HWFWM = "He Who Fights With Monsters {} - Shirtaloon"
+
+
+def catalog_with(*titles: str) -> Catalog:
+    catalog = Catalog(db_path=None)
+    catalog.add_results([(title, f"https://audiobookbay.lu/abss/post-{index}/") for index, title in enumerate(titles)])
+    return catalog
+
+
+def test_acronym_and_volume_find_the_post():
+    assert match_score("HWFWM 11", HWFWM.format(11)) >= CATALOG_MIN_SCORE
+
+
+def test_typos_still_match():
+    assert match_score("dungeon crawlr carl", "Dungeon Crawler Carl 3") >= CATALOG_MIN_SCORE
+
+
+def test_other_volumes_are_rejected():
+    assert match_score("He Who Fights With Monsters 11", HWFWM.format(10)) == 0.0
+    assert match_score("Harry Potter 1", "Harry Potter 2 - J.K. Rowling") == 0.0
+
+
+def test_volume_numbers_compare_as_numbers():
+    assert match_score("hwfwm 011", HWFWM.format(11)) >= CATALOG_MIN_SCORE
+
+
+def test_missing_volume_is_not_covered_by_its_neighbours():
+    catalog = catalog_with(*(HWFWM.format(volume) for volume in (8, 9, 10, 12)))
+
+    results, covered = catalog.search("He Who Fights With Monsters 11")
+
+    assert results == []
+    assert not covered
+
+
+def test_series_search_without_a_volume_is_covered():
+    catalog = catalog_with(*(HWFWM.format(volume) for volume in (8, 9, 10, 12)))
+
+    results, covered = catalog.search("HWFWM")
+
+    assert len(results) == 4
+    assert covered
+
+
+def test_post_path_is_the_same_on_every_mirror():
+    paths = {post_path(url) for url in ("https://audiobookbay.lu/abss/hwfwm-11/", "https://www.audiobookbay.lu/abss/hwfwm-11",
+                                         "http://audiobookbay.is/abss/hwfwm-11/")}
+    assert paths == {"/abss/hwfwm-11"}